@@ -1,26 +1,43 @@
 """
 Chat API routes for the SketchDojo platform
 """
+import hashlib
 import logging
-import uuid
-import json
 from typing import Dict, List, Any, Optional
 
-from fastapi import APIRouter, Depends, Body, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, Body, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from core.ai import AI
 from core.chat_ai import ChatAI, ChatMessage, ChatRequest, ChatResponse
+from utils.store import Store
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# In-memory chat history storage (use a database in production)
-chat_history = {}
+# Bounded in-memory chat history storage (use a database in production)
+# Idle projects expire after an hour, and only the latest turns are kept per project
+chat_history = Store(maxsize=512, ttl=3600, max_items=200)
 
-# Store HTML preview content for each project
-html_preview_content = {}
+# HTML preview content is stored once by SHA-1 and each project keeps a reference to it
+html_blobs = Store(maxsize=512, ttl=3600)
+html_preview_content = Store(maxsize=512, ttl=3600)
+
+def store_html_blob(html_content: str) -> str:
+    """
+    Store HTML content in the blob store
+    
+    Args:
+        html_content: HTML content to store
+        
+    Returns:
+        SHA-1 reference of the stored content
+    """
+    html_ref = hashlib.sha1(html_content.encode()).hexdigest()
+    html_blobs[html_ref] = html_content
+    return html_ref
 
 class ToolCallRequest(BaseModel):
     """Request for executing a tool call"""
@@ -34,13 +51,10 @@ class ToolCallResponse(BaseModel):
     result: Dict[str, Any] = Field(..., description="Result of executing the tool")
     message: str = Field(..., description="Human-readable message about the execution")
 
-async def get_chat_ai() -> ChatAI:
-    """Dependency to get a ChatAI instance"""
-    ai_client = AI(
-        model_name="gpt-4o-mini",  # Use the same model as in the main AI module
-        temperature=0.7
-    )
-    return ChatAI(ai_client)
+async def get_chat_ai(request: Request) -> ChatAI:
+    """Dependency to get the shared ChatAI instance created at startup"""
+    # Kept as a coroutine so FastAPI resolves it on the event loop, not the threadpool
+    return request.app.state.chat_ai
 
 @router.post("", response_model=ChatResponse)
 async def chat_with_ai(
@@ -59,23 +73,55 @@ async def chat_with_ai(
     """
     project_id = request.project_id
     
-    # Initialize chat history for this project if it doesn't exist
-    if project_id not in chat_history:
-        chat_history[project_id] = []
-    
     # Process the chat request
     try:
         response = await chat_ai.process_chat(request)
         
         # Store the messages in chat history
-        chat_history[project_id].extend(request.messages)
-        chat_history[project_id].append(response.message)
+        chat_history.append(project_id, *request.messages, response.message)
         
         return response
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
+@router.post("/stream")
+async def chat_with_ai_stream(
+    request: ChatRequest,
+    chat_ai: ChatAI = Depends(get_chat_ai)
+):
+    """
+    Chat with the SketchDojo AI, streaming the response as server-sent events
+    
+    Each event carries a JSON object, either {"type": "delta", "content": ...}
+    for a piece of the assistant's message or {"type": "done", ...} with the
+    complete ChatResponse as the last event.
+    
+    Args:
+        request: The chat request with messages and project ID
+        chat_ai: ChatAI instance (injected by FastAPI)
+        
+    Returns:
+        StreamingResponse of server-sent events
+    """
+    project_id = request.project_id
+    
+    async def events():
+        async for event in chat_ai.process_chat_stream(request):
+            if isinstance(event, ChatResponse):
+                # Store the messages in chat history once the response is complete
+                chat_history.append(project_id, *request.messages, event.message)
+                payload = {"type": "done", **event.model_dump()}
+            else:
+                payload = {"type": "delta", "content": event}
+            yield b"data: " + orjson.dumps(payload) + b"\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/tool-call", response_model=ToolCallResponse)
 async def execute_tool_call(
     request: ToolCallRequest,
@@ -96,20 +142,26 @@ async def execute_tool_call(
     try:
         # Execute the tool
         result_str = await chat_ai.execute_tool(request.tool_name, request.arguments)
-        result = json.loads(result_str)
+        result = orjson.loads(result_str)
         
         # Create a function message for the result
         if request.message_id:
+            # Store HTML content once and keep only a reference to it in the chat history
+            if 'html_content' in result and project_id is not None:
+                html_content = result['html_content']
+                html_preview_content[project_id] = store_html_blob(html_content)
+                result_str = orjson.dumps({
+                    **{k: v for k, v in result.items() if k != 'html_content'},
+                    'html_ref': html_preview_content[project_id],
+                    'html_bytes': len(html_content)
+                }).decode()
+            
             function_message = ChatMessage(
                 role="function",
                 content=result_str
             )
             if project_id in chat_history:
-                chat_history[project_id].append(function_message)
-                
-            # Store HTML content if present in the result
-            if 'html_content' in result and project_id is not None:
-                html_preview_content[project_id] = result['html_content']
+                chat_history.append(project_id, function_message)
         
         # Create a user-friendly message about what happened
         message = f"Successfully executed {request.tool_name}"
@@ -143,12 +195,14 @@ async def get_chat_history(project_id: str):
     response = ProjectHistoryResponse()
     
     # Get chat messages
-    if project_id in chat_history:
-        response.messages = chat_history[project_id]
+    messages = chat_history.get(project_id)
+    if messages is not None:
+        response.messages = messages
     
-    # Get HTML preview content
-    if project_id in html_preview_content:
-        response.html_content = html_preview_content[project_id]
+    # Resolve the HTML preview content from the blob store
+    html_ref = html_preview_content.get(project_id)
+    if html_ref is not None:
+        response.html_content = html_blobs.get(html_ref, "")
     
     return response
 
@@ -166,6 +220,6 @@ async def store_html_content(request: StoreHtmlRequest):
     project_id = request.project_id
     
     # Store the HTML content
-    html_preview_content[project_id] = request.html_content
+    html_preview_content[project_id] = store_html_blob(request.html_content)
     
     return {"message": "HTML content stored successfully"}
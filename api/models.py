@@ -1,12 +1,17 @@
 """
 API models for request/response validation using Pydantic
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Dict, List, Any, Optional
-import uuid
+import secrets
+
+# Request bodies are read-only once validated, so freeze them and drop unknown fields
+_REQUEST_CONFIG = ConfigDict(frozen=True, extra="ignore", str_strip_whitespace=True)
 
 class WebtoonRequest(BaseModel):
     """Request model for generating a webtoon"""
+    model_config = _REQUEST_CONFIG
+    
     prompt: str = Field(..., description="Main prompt describing the manga/webtoon to create")
     style: str = Field(default="manga", description="Art style (manga, webtoon, comic)")
     num_panels: int = Field(default=6, description="Number of panels to generate", ge=1, le=20)
@@ -15,7 +20,7 @@ class WebtoonRequest(BaseModel):
 
 class TaskResponse(BaseModel):
     """Response model for task creation"""
-    task_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    task_id: str = Field(default_factory=lambda: secrets.token_hex(16))
 
 class TaskStatus(BaseModel):
     """Response model for task status"""
@@ -26,6 +31,8 @@ class TaskStatus(BaseModel):
 
 class PanelUpdate(BaseModel):
     """Request model for updating a panel"""
+    model_config = _REQUEST_CONFIG
+    
     description: Optional[str] = Field(default=None, description="Updated visual description")
     characters: Optional[List[str]] = Field(default=None, description="Updated characters list")
     dialogue: Optional[List[Dict[str, str]]] = Field(default=None, description="Updated dialogue")
@@ -35,6 +42,8 @@ class PanelUpdate(BaseModel):
 
 class ImageGenerationRequest(BaseModel):
     """Request model for standalone image generation"""
+    model_config = _REQUEST_CONFIG
+    
     prompt: str = Field(..., description="Prompt for the image")
     style: str = Field(default="manga", description="Art style (manga, webtoon, comic)")
     width: int = Field(default=768, description="Image width in pixels")
@@ -46,6 +55,8 @@ class ImageGenerationResponse(BaseModel):
 
 class ProjectRequest(BaseModel):
     """Request model for creating a new project"""
+    model_config = _REQUEST_CONFIG
+    
     prompt: str = Field(..., description="Initial prompt for the project")
 
 class ProjectResponse(BaseModel):
@@ -1,13 +1,20 @@
 """
 API routes for manga/webtoon generation
 """
+import asyncio
+import hashlib
 import logging
 import os
-import uuid
+import secrets
+from dataclasses import asdict, dataclass
 from datetime import datetime
+from email.utils import formatdate
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Body, Depends
-from fastapi.responses import HTMLResponse, FileResponse
+import aiofiles
+from fastapi import APIRouter, HTTPException, Body, Depends, Request
+from fastapi.responses import HTMLResponse, FileResponse, Response
+from jinja2 import Environment, FileSystemLoader
 
 from api.models import (
     WebtoonRequest,
@@ -19,22 +26,51 @@ from api.models import (
 from core.ai import AI
 from core.manga_generator import MangaGenerator
 from models.panel import PanelRequest
+from utils.store import Store
+from utils.task_queue import TaskQueue
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# In-memory task storage (use a database in production)
-tasks = {}
-projects = {}
+@dataclass(slots=True)
+class _TaskState:
+    """Internal task state, converted to the TaskStatus response model only at the API boundary"""
+    task_id: str
+    status: str = "pending"
+    progress: float = 0.0
+    result: Optional[Dict[str, Any]] = None
 
-async def get_ai_client() -> AI:
-    """Dependency to get AI client instance"""
-    return AI(
-        model_name=os.getenv("MODEL_NAME", "gpt-4o-mini"),
-        temperature=float(os.getenv("MODEL_TEMPERATURE", "0.7")),
-    )
+# Bounded in-memory task storage (use a database in production)
+# Finished tasks are evicted before pending/processing ones
+tasks = Store(maxsize=1024, evict_first=lambda task: task.status in ("completed", "failed"))
+projects = Store(maxsize=1024)
+
+# Generation tasks started without a task queue, referenced until they finish so they are not garbage collected
+_background_tasks: "set[asyncio.Task]" = set()
+
+# HTML of completed results keyed by task_id, to avoid re-reading files on every request
+_html_cache = Store(maxsize=256)
+
+# Fallback page shown when generation fails, compiled once at import
+_templates = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "../templates")),
+    autoescape=True,
+)
+_FALLBACK_TEMPLATE = _templates.get_template("fallback.html")
+
+# Result pages larger than this are streamed from disk rather than cached in memory
+HTML_CACHE_MAX_BYTES = int(os.getenv("HTML_CACHE_MAX_BYTES", str(256 * 1024)))
+
+async def get_ai_client(request: Request) -> AI:
+    """Dependency to get the shared AI client instance created at startup"""
+    # Kept as a coroutine so FastAPI resolves it on the event loop, not the threadpool
+    return request.app.state.ai
+
+async def get_task_queue(request: Request) -> TaskQueue:
+    """Dependency to get the generation task queue created at startup"""
+    return request.app.state.task_queue
 
 async def generate_webtoon_task(
     task_id: str,
@@ -43,12 +79,10 @@ async def generate_webtoon_task(
 ):
     """Background task to generate a webtoon"""
     try:
-        # Update task status to processing
-        tasks[task_id] = TaskStatus(
-            task_id=task_id,
-            status="processing",
-            progress=0.0
-        )
+        # Update task state in place, the final result replaces it below
+        task = tasks[task_id]
+        task.status = "processing"
+        task.progress = 0.0
         
         logger.info(f"Starting generation for task {task_id}")
         
@@ -56,7 +90,7 @@ async def generate_webtoon_task(
         generator = MangaGenerator(ai)
         
         # Generate the story and update progress
-        tasks[task_id].progress = 0.1
+        task.progress = 0.1
         logger.info(f"Generating story for task {task_id}")
         
         # Add retry logic with a maximum number of attempts
@@ -80,44 +114,66 @@ async def generate_webtoon_task(
                 # Wait briefly before retry
                 await asyncio.sleep(1)
         
-        tasks[task_id].progress = 0.3
-        
-        # Generate panels and update progress with similar retry logic
-        logger.info(f"Generating panels for task {task_id}")
-        attempt = 0
-        panels = None
+        task.progress = 0.3
         
-        while attempt < max_attempts:
-            try:
-                attempt += 1
-                panels = await generator.generate_panels(
-                    story, 
-                    request.num_panels
-                )
-                break
-            except Exception as e:
-                logger.warning(f"Panel generation attempt {attempt}/{max_attempts} failed: {str(e)}")
-                if attempt >= max_attempts:
-                    raise ValueError(f"Failed to generate panels after {max_attempts} attempts: {str(e)}")
-                await asyncio.sleep(1)
-                
-        tasks[task_id].progress = 0.5
+        # Stream panels with similar retry logic, starting each panel's image as soon as the panel arrives.
+        # Images run concurrently, the image service bounds the API calls in flight.
+        logger.info(f"Generating panels and images for task {task_id}")
+        completed = 0
+        # Images cover the 0.5 -> 0.9 progress range, split evenly between the requested panels
+        progress_step = 0.4 / request.num_panels if request.num_panels else 0.0
         
-        # Generate images for each panel
-        logger.info(f"Generating images for task {task_id}")
-        for i, panel in enumerate(panels):
+        async def generate_panel_image(panel):
+            nonlocal completed
             await generator.generate_image_for_panel(
                 panel, 
                 request.style
             )
-            tasks[task_id].progress = 0.5 + ((i + 1) / len(panels) * 0.4)
+            completed += 1
+            task.progress = max(task.progress, min(0.5 + completed * progress_step, 0.9))
+        
+        attempt = 0
+        panels = None
+        image_tasks = []
+        
+        try:
+            while attempt < max_attempts:
+                panels = []
+                image_tasks = []
+                try:
+                    attempt += 1
+                    async for panel in generator.stream_panels(story, request.num_panels):
+                        panels.append(panel)
+                        image_tasks.append(asyncio.create_task(generate_panel_image(panel)))
+                    break
+                except Exception as e:
+                    logger.warning(f"Panel generation attempt {attempt}/{max_attempts} failed: {str(e)}")
+                    # Images of a failed attempt belong to discarded panels
+                    for image_task in image_tasks:
+                        image_task.cancel()
+                    await asyncio.gather(*image_tasks, return_exceptions=True)
+                    completed = 0
+                    if attempt >= max_attempts:
+                        raise ValueError(f"Failed to generate panels after {max_attempts} attempts: {str(e)}")
+                    await asyncio.sleep(1)
+                    
+            task.progress = max(task.progress, 0.5)
+            
+            # Wait for the images still being generated
+            await asyncio.gather(*image_tasks)
+        except BaseException:
+            # A cancelled job or a failed image must not leave the other images calling the API
+            for image_task in image_tasks:
+                image_task.cancel()
+            await asyncio.gather(*image_tasks, return_exceptions=True)
+            raise
         
         # Generate HTML output
         logger.info(f"Generating HTML output for task {task_id}")
         html_path = await generator.generate_html_output(panels, task_id)
         
         # Update task status to completed
-        tasks[task_id] = TaskStatus(
+        tasks[task_id] = _TaskState(
             task_id=task_id,
             status="completed",
             progress=1.0,
@@ -133,46 +189,16 @@ async def generate_webtoon_task(
         logger.error(f"Error in task {task_id}: {str(e)}", exc_info=True)
         
         # Generate a basic fallback HTML when validation fails
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Error Generating Webtoon</title>
-            <style>
-                body {{ font-family: sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; color: #333; }}
-                .error-container {{ background-color: #f8d7da; border: 1px solid #f5c6cb; border-radius: 4px; padding: 20px; margin: 20px 0; }}
-                h1 {{ color: #721c24; }}
-                .message {{ background: #f8f9fa; padding: 15px; border-radius: 4px; margin: 20px 0; }}
-                .suggestion {{ background: #d1ecf1; padding: 15px; border-radius: 4px; }}
-            </style>
-        </head>
-        <body>
-            <h1>Oops! There was a problem generating your webtoon</h1>
-            <div class="error-container">
-                <p>We encountered an error while creating your webtoon based on the prompt:</p>
-                <div class="message"><strong>"{request.prompt}"</strong></div>
-            </div>
-            <div class="suggestion">
-                <h3>Try one of these instead:</h3>
-                <ul>
-                    <li>"Create a simple manga about a student discovering magic powers"</li>
-                    <li>"Generate a short comic about a detective solving a mystery"</li>
-                    <li>"Make a fantasy webtoon with a hero and a dragon"</li>
-                </ul>
-            </div>
-            <p>Technical details: {str(e)[:150]}...</p>
-        </body>
-        </html>
-        """
+        html_content = _FALLBACK_TEMPLATE.render(prompt=request.prompt, error=str(e)[:150])
         
         # Save the fallback HTML
         fallback_html_path = f"static/webtoons/{task_id}.html"
-        os.makedirs(os.path.dirname(fallback_html_path), exist_ok=True)
-        with open(fallback_html_path, "w") as f:
-            f.write(html_content)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(fallback_html_path), exist_ok=True)
+        async with aiofiles.open(fallback_html_path, "wb") as f:
+            await f.write(html_content.encode())
             
         # Update task status to failed but provide the fallback HTML
-        tasks[task_id] = TaskStatus(
+        tasks[task_id] = _TaskState(
             task_id=task_id,
             status="failed",
             progress=0.0,
@@ -183,31 +209,51 @@ async def generate_webtoon_task(
             }
         )
 
-@router.post("/generate", response_model=TaskResponse)
-async def generate_webtoon(
-    background_tasks: BackgroundTasks,
+def start_generation_task(
     request: WebtoonRequest,
-    ai: AI = Depends(get_ai_client)
-):
-    """Start a new webtoon generation task"""
-    task_id = str(uuid.uuid4())
+    ai: AI,
+    task_queue: Optional[TaskQueue] = None
+) -> str:
+    """
+    Register a new webtoon generation task and start it
+    
+    Args:
+        request: The webtoon generation request
+        ai: AI client used for the generation
+        task_queue: Queue whose workers run the generation, if None it runs as a standalone asyncio task
+        
+    Returns:
+        ID of the new task
+    """
+    task_id = secrets.token_hex(16)
     logger.info(f"Creating new generation task: {task_id}")
     
     # Store initial task status
-    tasks[task_id] = TaskStatus(
-        task_id=task_id,
-        status="pending", 
-        progress=0.0
-    )
+    tasks[task_id] = _TaskState(task_id=task_id)
     
-    # Add generation task to background tasks
-    background_tasks.add_task(
-        generate_webtoon_task, 
-        task_id, 
-        request,
-        ai
-    )
+    if task_queue is not None:
+        # Hand the generation off to the task queue workers
+        task_queue.enqueue(
+            generate_webtoon_task, 
+            task_id, 
+            request,
+            ai
+        )
+    else:
+        task = asyncio.create_task(generate_webtoon_task(task_id, request, ai))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
     
+    return task_id
+
+@router.post("/generate", response_model=TaskResponse)
+async def generate_webtoon(
+    request: WebtoonRequest,
+    ai: AI = Depends(get_ai_client),
+    task_queue: TaskQueue = Depends(get_task_queue)
+):
+    """Start a new webtoon generation task"""
+    task_id = start_generation_task(request, ai, task_queue)
     return TaskResponse(task_id=task_id)
 
 @router.get("/tasks/{task_id}", response_model=TaskStatus)
@@ -217,11 +263,12 @@ async def get_task_status(task_id: str):
         logger.warning(f"Task not found: {task_id}")
         raise HTTPException(status_code=404, detail="Task not found")
     
-    logger.debug(f"Retrieved status for task {task_id}: {tasks[task_id].status}")
-    return tasks[task_id]
+    task = tasks[task_id]
+    logger.debug(f"Retrieved status for task {task_id}: {task.status}")
+    return TaskStatus.model_validate(asdict(task))
 
 @router.get("/result/{task_id}", response_class=HTMLResponse)
-async def get_webtoon_result(task_id: str):
+async def get_webtoon_result(task_id: str, request: Request):
     """Get the HTML result of a completed webtoon generation task"""
     if task_id not in tasks:
         logger.warning(f"Task not found: {task_id}")
@@ -232,22 +279,43 @@ async def get_webtoon_result(task_id: str):
         logger.warning(f"Task {task_id} is not completed: {task.status}")
         raise HTTPException(status_code=400, detail=f"Task is not completed, current status: {task.status}")
     
-    html_path = task.result.get("html_path")
-    if not html_path or not os.path.exists(html_path):
-        logger.error(f"HTML output not found for task {task_id}: {html_path}")
-        raise HTTPException(status_code=404, detail="HTML output not found")
+    # Completed results never change, so serve repeated reads from memory
+    cached = _html_cache.get(task_id)
+    if cached is None:
+        html_path = task.result.get("html_path")
+        if not html_path or not await asyncio.to_thread(os.path.exists, html_path):
+            logger.error(f"HTML output not found for task {task_id}: {html_path}")
+            raise HTTPException(status_code=404, detail="HTML output not found")
+        
+        stat_result = await asyncio.to_thread(os.stat, html_path)
+        if stat_result.st_size > HTML_CACHE_MAX_BYTES:
+            # Large pages (e.g. with embedded images) are streamed from disk instead of held in memory
+            logger.info(f"Streaming HTML result for task {task_id} ({stat_result.st_size} bytes)")
+            return FileResponse(html_path, media_type="text/html", stat_result=stat_result)
+        
+        # Kept as the UTF-8 bytes written by the generator, so the page is never decoded and re-encoded
+        async with aiofiles.open(html_path, "rb") as f:
+            html_content = await f.read()
+        
+        headers = {
+            "ETag": f'"{hashlib.sha1(html_content).hexdigest()}"',
+            "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        }
+        cached = (html_content, headers)
+        _html_cache[task_id] = cached
     
-    with open(html_path, "r") as f:
-        html_content = f.read()
+    html_content, headers = cached
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
     
     logger.info(f"Returning HTML result for task {task_id}")
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=html_content, headers=headers)
 
 @router.post("/projects", response_model=ProjectResponse)
 async def create_project(request: ProjectRequest):
     """Create a new project with an initial prompt"""
     try:
-        project_id = str(uuid.uuid4())
+        project_id = secrets.token_hex(16)
         logger.info(f"Creating new project: {project_id}")
         
         # Store initial project data
@@ -255,7 +323,7 @@ async def create_project(request: ProjectRequest):
             "id": project_id,
             "name": f"Webtoon Project {project_id[:8]}",  # Generate a random name
             "prompt": request.prompt,
-            "created_at": datetime.now().isoformat(),
+            "created_at": datetime.now(),
             "status": "created"
         }
         
@@ -282,7 +350,7 @@ async def download_webtoon_result(task_id: str):
         raise HTTPException(status_code=400, detail=f"Task is not completed, current status: {task.status}")
     
     html_path = task.result.get("html_path")
-    if not html_path or not os.path.exists(html_path):
+    if not html_path or not await asyncio.to_thread(os.path.exists, html_path):
         logger.error(f"HTML output not found for task {task_id}: {html_path}")
         raise HTTPException(status_code=404, detail="HTML output not found")
     
@@ -295,20 +363,15 @@ async def download_webtoon_result(task_id: str):
 
 @router.post("/panels", response_model=TaskResponse)
 async def create_custom_panel(
-    background_tasks: BackgroundTasks,
     request: PanelRequest = Body(...),
     ai: AI = Depends(get_ai_client)
 ):
     """Create a custom panel with specific details"""
-    task_id = str(uuid.uuid4())
+    task_id = secrets.token_hex(16)
     logger.info(f"Creating custom panel task: {task_id}")
     
     # Store initial task status
-    tasks[task_id] = TaskStatus(
-        task_id=task_id,
-        status="pending", 
-        progress=0.0
-    )
+    tasks[task_id] = _TaskState(task_id=task_id)
     
     # TODO: Implement custom panel creation logic
     # This would be a simplified version of the webtoon generation
@@ -23,6 +23,39 @@ BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 STATIC_PATH = "static"
 IMAGES_PATH = f"{STATIC_PATH}/images"
 
+# Model configuration, read once at import
+MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o-mini")
+MODEL_TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", "0.7"))
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "2"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "16"))
+# OpenAI rate limits for the configured model, requests are paced to stay below them
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "3500"))
+OPENAI_TPM = float(os.getenv("OPENAI_TPM", "90000"))
+
+# Image generation configuration, read once at import
+STABILITY_API_KEY = os.getenv("STABILITY_API_KEY") or os.getenv("STABLE_DIFFUSION_API_KEY")
+IMAGE_API_URL = os.getenv(
+    "IMAGE_API_URL",
+    "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
+)
+# Maximum number of image API requests in flight at the same time, across all generation tasks
+IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", "4"))
+
+# Model response cache (deterministic requests only, unless LLM_CACHE_ALL is enabled)
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_ALL = os.getenv("LLM_CACHE_ALL", "false").lower() == "true"
+
+# Semantic story cache, set SEMANTIC_CACHE_SIZE to 0 to disable it
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "10000"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.93"))
+
+# Semantic chat answer cache, set CHAT_CACHE_SIZE to 0 to disable it
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "10000"))
+CHAT_CACHE_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.95"))
+
+# Comma-separated list of allowed CORS origins, "*" allows any origin but disables credentials
+CORS_ORIGINS = tuple(origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip())
+
 # Define URL paths for better accessibility
 def get_image_url(relative_path):
     """Convert a relative path to a full URL with the BASE_URL"""
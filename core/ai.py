@@ -1,20 +1,139 @@
 """
 AI interface for interacting with language models to generate manga/webtoon content
 """
+import asyncio
+import functools
 import os
-import json
 import logging
-from typing import Dict, List, Any, Optional, Union, TypeVar, Generic, Literal
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from pydantic import BaseModel, Field
+import random
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple, Union, TypeVar, Generic, Literal
+from pydantic import BaseModel, Field, model_validator
+from pydantic_core import from_json
+from typing_extensions import TypedDict
 
+import httpx
+import orjson
 from openai import AsyncOpenAI, APIError, RateLimitError
 
+from core.ai_cache import LLMCache, SemanticCache
+from utils.rate_limiter import AsyncTokenBucket
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T', bound=BaseModel)
 
+# OpenAI clients shared by AI instances created without an HTTP client, keyed by (api_key, organization_id)
+_CLIENTS: Dict[Tuple[str, Optional[str]], AsyncOpenAI] = {}
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP/2 client for OpenAI requests.
+    
+    Idle connections are kept for five minutes so bursts of requests skip the
+    TCP/TLS handshake, and the read timeout leaves room for long streamed responses.
+    
+    Returns:
+        A new HTTP client, to be shared by every AI instance that uses it
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=300.0),
+        timeout=httpx.Timeout(300.0, connect=10.0),
+    )
+
+# System prompts are static, keeping them identical across calls lets OpenAI
+# prompt caching reuse the prefix; dynamic content always goes last
+_SYSTEM_STORY = """
+You are a professional manga/webtoon writer. Your task is to create a compelling
+story outline based on the provided prompt. The outline should include:
+1. Setting (time period, location)
+2. Main characters (with brief descriptions)
+3. Plot summary
+4. Key scenes that would make good visual panels
+5. Theme and mood
+
+Provide your response as a structured JSON with these elements.
+""".strip()
+
+_SYSTEM_PANELS = """
+You are a professional manga/webtoon artist and writer. Your task is to create detailed
+panel descriptions based on the provided story outline. Each panel description should include:
+1. Visual description (what should be drawn)
+2. Characters present
+3. Dialogue (if any)
+4. Special effects or text elements
+5. Panel size recommendation (full-width, half-width, etc.)
+
+Format your response as a JSON object with a "panels" array containing panel objects.
+""".strip()
+
+_SYSTEM_IMAGE_PROMPT = """
+You are a professional manga/webtoon artist. Your task is to create a detailed prompt
+for an image generation AI based on the panel description provided. The prompt should be
+detailed and specific, including:
+1. Scene description
+2. Character positions and expressions
+3. Lighting and atmosphere
+4. Art style references
+5. Composition details
+
+The prompt should be detailed yet concise, optimized for image generation AI.
+""".strip()
+
+_SYSTEM_SPEECH_BUBBLES = """
+You are a professional manga/webtoon editor specializing in text and speech bubble placement.
+Your task is to determine optimal placement and styling for speech bubbles in a panel.
+For each dialogue line, provide:
+1. Position (top-left, center-right, etc.)
+2. Style (normal, thought, shouted, etc.)
+3. Tail direction (pointing to which character)
+4. Character name
+5. Text content
+
+Format your response as a JSON object with a "speechBubbles" array containing objects with fields:
+- text: The text content of the speech bubble
+- character: The character speaking
+- position: Position on panel (top-left, center-right, etc.)
+- style: Style (normal, thought, shouted)
+- tail_direction: Direction the tail points
+""".strip()
+
+_SYSTEM_SPEECH_BUBBLES_BATCH = """
+You are a professional manga/webtoon editor specializing in text and speech bubble placement.
+Your task is to determine optimal placement and styling for speech bubbles in several panels at once.
+For each dialogue line of each panel, provide:
+1. Position (top-left, center-right, etc.)
+2. Style (normal, thought, shouted, etc.)
+3. Tail direction (pointing to which character)
+4. Character name
+5. Text content
+
+Format your response as a JSON object with a "panels" array containing one object per panel with fields:
+- panel: The panel number given in the request
+- speechBubbles: Array of objects with fields:
+  - text: The text content of the speech bubble
+  - character: The character speaking
+  - position: Position on panel (top-left, center-right, etc.)
+  - style: Style (normal, thought, shouted)
+  - tail_direction: Direction the tail points
+""".strip()
+
+# Fixed scaffold of the panel description prompt, the story outline is appended last
+_PANEL_USER_SCAFFOLD = (
+    "Create {num_panels} panel descriptions for this story that would make a compelling manga/webtoon.\n"
+    "Make sure the panels flow logically and capture key moments from the story.\n\n"
+    "Story outline: "
+)
+
+# Bookkeeping fields added to story outlines after generation, they carry nothing to draw
+_STORY_BOOKKEEPING_FIELDS = frozenset({"generated_at"})
+
+@functools.lru_cache(maxsize=64)
+def _panel_user_prefix(num_panels: int) -> str:
+    """Format the panel prompt scaffold once per panel count"""
+    return _PANEL_USER_SCAFFOLD.format(num_panels=num_panels)
+
 class StoryResponse(BaseModel):
     """Story generation response schema"""
     setting: Dict[str, str] = Field(..., description="Time period and location details")
@@ -23,14 +142,169 @@ class StoryResponse(BaseModel):
     key_scenes: List[Union[str, Dict[str, str]]] = Field(..., description="Key scenes for visual panels, can be strings or dictionaries with 'scene' key")
     theme: str = Field(..., description="Theme of the story")
     mood: str = Field(..., description="Overall mood/tone")
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _fill_missing_fields(cls, data: Any) -> Any:
+        """Fill in required fields the model commonly leaves out"""
+        if not isinstance(data, dict):
+            return data
+        
+        # Ensure theme field exists
+        if "theme" not in data:
+            # Try to extract theme from plot summary or setting
+            if "plot_summary" in data:
+                data["theme"] = "Themes derived from the plot"
+            elif "setting" in data and isinstance(data["setting"], dict) and data["setting"]:
+                data["theme"] = "Themes related to the setting"
+            else:
+                data["theme"] = "Adventure and discovery"
+        
+        # Ensure mood field exists
+        if "mood" not in data:
+            # Try to infer mood from other fields
+            if "plot_summary" in data and "tragic" in data["plot_summary"].lower():
+                data["mood"] = "Somber and reflective"
+            elif "plot_summary" in data and ("action" in data["plot_summary"].lower() or "battle" in data["plot_summary"].lower()):
+                data["mood"] = "Intense and dramatic"
+            else:
+                data["mood"] = "Balanced mix of light and serious moments"
+        
+        # Add missing required fields
+        if "main_characters" not in data:
+            data["main_characters"] = [{"name": "Protagonist", "description": "Main character of the story"}]
+        
+        if "plot_summary" not in data:
+            if "setting" in data and isinstance(data["setting"], dict):
+                setting_desc = ""
+                if "description" in data["setting"]:
+                    setting_desc = data["setting"]["description"]
+                elif "timePeriod" in data["setting"]:
+                    setting_desc = f"Set in {data['setting']['timePeriod']}"
+                data["plot_summary"] = f"A story set in {setting_desc}"
+            else:
+                data["plot_summary"] = "An engaging story with twists and character development"
+        
+        if "key_scenes" not in data:
+            data["key_scenes"] = [{"description": "Introduction to the main character and setting"}]
+        
+        return data
+
+def _split_dialogue_line(line: str) -> Dict[str, str]:
+    """Split a "Character: Text" line into a dialogue entry"""
+    character, separator, text = line.partition(":")
+    if separator:
+        return {"character": character.strip(), "text": text.strip()}
+    # If no character name can be extracted, use a default
+    return {"character": "Character", "text": line}
+
+def _normalize_dialogue_entry(entry: Any) -> Dict[str, str]:
+    """Convert one dialogue entry to a dict with both character and text fields"""
+    entry_type = type(entry)
+    if entry_type is dict:
+        # Canonical entries only cost two key lookups
+        if "character" not in entry:
+            entry["character"] = "Character"
+        if "text" not in entry:
+            entry["text"] = "..."
+        return entry
+    if entry_type is str:
+        return _split_dialogue_line(entry)
+    return {"character": "Character", "text": str(entry)}
+
+def _normalize_dialogue(dialogue: Any) -> List[Dict[str, str]]:
+    """
+    Normalize model-generated dialogue to a list of character/text dicts in a single pass
+    
+    Args:
+        dialogue: Dialogue as a "Character: Text" string, a list of strings or dicts, or any other value
+        
+    Returns:
+        List of dialogue entries
+    """
+    dialogue_type = type(dialogue)
+    if dialogue_type is list:
+        return [_normalize_dialogue_entry(entry) for entry in dialogue]
+    if dialogue_type is str:
+        return [_split_dialogue_line(dialogue.strip())]
+    # Convert any other dialogue to a list with a single item
+    return [{"character": "Character", "text": str(dialogue)}]
+
+class DialogueLine(TypedDict):
+    """A line of dialogue, validated as a fixed-shape dict"""
+    character: str
+    text: str
 
 class PanelDescription(BaseModel):
     """Panel description schema"""
     visual_description: str = Field(..., description="What should be drawn")
     characters: List[str] = Field(..., description="Characters present in the panel")
-    dialogue: List[Dict[str, str]] = Field(default_factory=list, description="Dialogue lines with character names")
+    dialogue: List[DialogueLine] = Field(default_factory=list, description="Dialogue lines with character names")
     special_effects: Optional[List[str]] = Field(default_factory=list, description="Special effects or text elements")
     panel_size: str = Field(default="full-width", description="Panel size recommendation")
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _normalize_fields(cls, data: Any) -> Any:
+        """Fix common formatting issues in model-generated panel descriptions"""
+        if not isinstance(data, dict):
+            return data
+        
+        # Ensure characters field exists and is a list
+        if "characters" not in data or not isinstance(data["characters"], list) or not data["characters"]:
+            # Extract character names from dialogue if possible
+            if "dialogue" in data and data["dialogue"]:
+                if isinstance(data["dialogue"], str):
+                    # Try to extract character names from dialogue string
+                    dialogue_parts = data["dialogue"].split(":", 1)
+                    if len(dialogue_parts) > 0:
+                        data["characters"] = [dialogue_parts[0].strip()]
+                    else:
+                        data["characters"] = ["Character"]
+                elif isinstance(data["dialogue"], list) and data["dialogue"] and isinstance(data["dialogue"][0], dict) and "character" in data["dialogue"][0]:
+                    # Extract character names from dialogue list of dicts
+                    data["characters"] = list(set([d["character"] for d in data["dialogue"] if "character" in d]))
+                else:
+                    data["characters"] = ["Character"]
+            else:
+                data["characters"] = ["Character"]
+        
+        # Ensure dialogue is in the correct format (list of dicts)
+        if "dialogue" in data:
+            data["dialogue"] = _normalize_dialogue(data["dialogue"])
+        
+        # Ensure special_effects is a list if present
+        if "special_effects" in data:
+            if not isinstance(data["special_effects"], list):
+                # Convert string or other non-list types to a list with one item
+                data["special_effects"] = [str(data["special_effects"])]
+        
+        # Convert panel_size to a valid value
+        if "panel_size" in data:
+            # Map common size names to valid sizes
+            size_mapping = {
+                "full-width": "full",
+                "full_width": "full",
+                "fullwidth": "full",
+                "half-width": "half",
+                "half_width": "half",
+                "halfwidth": "half",
+                "third-width": "third",
+                "third_width": "third",
+                "thirdwidth": "third",
+                "quarter-width": "quarter",
+                "quarter_width": "quarter",
+                "quarterwidth": "quarter"
+            }
+        
+            panel_size = data["panel_size"].lower()
+            if panel_size in size_mapping:
+                data["panel_size"] = size_mapping[panel_size]
+            elif panel_size not in ["full", "half", "third", "quarter"]:
+                # Default to full if unknown size format
+                data["panel_size"] = "full"
+        
+        return data
 
 class PanelDescriptionsResponse(BaseModel):
     """Response containing panel descriptions"""
@@ -48,6 +322,14 @@ class SpeechBubblesResponse(BaseModel):
     """Response containing speech bubbles"""
     speechBubbles: List[SpeechBubble]
 
+class PanelSpeechBubbles(SpeechBubblesResponse):
+    """Speech bubbles of one panel in a batch response"""
+    panel: int = Field(..., description="Panel number given in the request")
+
+class SpeechBubblesBatchResponse(BaseModel):
+    """Response containing speech bubbles for several panels"""
+    panels: List[PanelSpeechBubbles]
+
 class AI:
     """
     Interface for interacting with language models to generate manga/webtoon content.
@@ -64,6 +346,14 @@ class AI:
         api_key: Optional[str] = None,
         organization_id: Optional[str] = None,
         max_retries: int = 3,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_concurrency: int = 8,
+        cache: Optional[LLMCache] = None,
+        cache_all: bool = False,
+        semantic_cache: Optional[SemanticCache] = None,
+        embedding_model: str = "text-embedding-3-small",
+        rpm: float = 3500,
+        tpm: float = 90000,
     ):
         """
         Initialize the AI class with model configuration.
@@ -74,10 +364,28 @@ class AI:
             api_key: API key for OpenAI (if None, uses environment variable)
             organization_id: Organization ID for OpenAI (if applicable)
             max_retries: Maximum number of retry attempts on API errors
+            http_client: Optional shared HTTP client so connections are reused across requests
+            max_concurrency: Maximum number of model requests in flight at the same time
+            cache: Optional response cache, used for deterministic (temperature 0) requests
+            cache_all: Also cache requests with a non-zero temperature
+            semantic_cache: Optional cache reusing stories generated for similar prompts
+            embedding_model: Embedding model used for semantic cache lookups
+            rpm: Requests per minute allowed by the API rate limit
+            tpm: Tokens per minute allowed by the API rate limit
         """
         self.model_name = model_name
         self.temperature = temperature
         self.max_retries = max_retries
+        # Bounds concurrent requests when callers fan out per-panel work with asyncio.gather
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Paces requests below the API limits instead of relying on 429 retries
+        self._rate_limiter = AsyncTokenBucket(rpm, tpm)
+        # Futures of requests in flight, so identical concurrent requests share one API call
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.cache = cache
+        self.cache_all = cache_all
+        self.semantic_cache = semantic_cache
+        self.embedding_model = embedding_model
         
         # Configure client
         api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -86,21 +394,184 @@ class AI:
         
         # Initialize OpenAI client without proxy configuration
         # The error was caused by the client trying to use proxies from environment variables
-        self.client = AsyncOpenAI(
-            api_key=api_key,
-            organization=organization_id,
-            # Explicitly set http_client without proxies to avoid the error
-            http_client=None
-        )
+        if http_client is not None:
+            # The caller's HTTP client is owned by this instance and closed with it
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                organization=organization_id,
+                http_client=http_client
+            )
+            self._owns_client = True
+        else:
+            # Without one, share a pooled HTTP/2 client per credential so ad-hoc
+            # AI instances don't each pay for new TCP/TLS connections
+            key = (api_key, organization_id)
+            if key not in _CLIENTS:
+                _CLIENTS[key] = AsyncOpenAI(
+                    api_key=api_key,
+                    organization=organization_id,
+                    http_client=create_http_client()
+                )
+            self.client = _CLIENTS[key]
+            self._owns_client = False
         
         logger.info(f"Initialized AI with model: {model_name}")
     
-    @retry(
-        retry=retry_if_exception_type((APIError, RateLimitError)),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        reraise=True,
-    )
+    async def close(self):
+        """Close the underlying OpenAI client and its HTTP connection pool, unless it is shared"""
+        if self._owns_client:
+            await self.client.close()
+    
+    async def _embed(self, text: str) -> List[float]:
+        """
+        Embed text with the configured embedding model.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            The embedding vector
+        """
+        async with self._semaphore:
+            response = await self.client.embeddings.create(model=self.embedding_model, input=text)
+        return response.data[0].embedding
+    
+    def build_request_params(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response_format: Optional[Literal["json_object", "text"]] = None,
+        temperature: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build the chat completion parameters for a request.
+        
+        Args:
+            system_prompt: System prompt to guide the model
+            user_prompt: User prompt containing the main request
+            response_format: Optional response format specification
+            temperature: Optional temperature override
+            
+        Returns:
+            Keyword arguments for chat.completions.create
+        """
+        request_params = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            # An explicit temperature of 0 must not fall back to the default
+            "temperature": self.temperature if temperature is None else temperature,
+        }
+        
+        # Add response format if specified
+        if response_format:
+            request_params["response_format"] = {"type": response_format}
+        
+        return request_params
+    
+    def _parse_response(
+        self,
+        content: str,
+        response_model: Optional[type[T]] = None,
+        response_format: Optional[Literal["json_object", "text"]] = None,
+    ) -> Union[str, T]:
+        """
+        Validate raw model output against a response model.
+        
+        Args:
+            content: Raw message content returned by the model
+            response_model: Optional Pydantic model for response validation
+            response_format: Response format the content was requested in
+            
+        Returns:
+            Either the content string or a validated Pydantic model based on response_model
+        """
+        if response_model and response_format == "json_object":
+            try:
+                # Fixups for common output issues run in the response models' before-validators
+                return response_model.model_validate_json(content)
+            except Exception as e:
+                logger.error(f"Error parsing response as {response_model.__name__}: {str(e)}")
+                logger.debug(f"Raw response: {content}")
+                raise ValueError(f"Failed to parse response as {response_model.__name__}: {str(e)}")
+        
+        return content
+    
+    async def _create_completion(self, request_params: Dict[str, Any]) -> Any:
+        """
+        Call the chat completions API, retrying API errors with full-jitter exponential backoff.
+        
+        Args:
+            request_params: Keyword arguments for chat.completions.create
+            
+        Returns:
+            The chat completion response
+        """
+        # Rough estimate of prompt tokens, about four characters per token
+        estimated_tokens = sum(len(message["content"]) for message in request_params["messages"]) // 4
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._rate_limiter.acquire(estimated_tokens)
+                async with self._semaphore:
+                    return await self.client.chat.completions.create(**request_params)
+            except (APIError, RateLimitError) as e:
+                if attempt == self.max_retries:
+                    raise
+                # Random delays keep concurrent requests that hit a 429 together from retrying in lockstep
+                delay = random.uniform(0, min(2 ** attempt, 10.0))
+                if isinstance(e, RateLimitError):
+                    # Never retry before the API says the limit resets
+                    try:
+                        delay = max(delay, float(e.response.headers.get("retry-after", 0)))
+                    except ValueError:
+                        pass
+                logger.warning(f"API error (retrying in {delay:.2f}s): {str(e)}")
+                await asyncio.sleep(delay)
+    
+    async def _fetch_content(self, request_params: Dict[str, Any], request_key: str) -> Optional[str]:
+        """
+        Request a completion, sharing the result with an identical request already in flight.
+        
+        Args:
+            request_params: Keyword arguments for chat.completions.create
+            request_key: Hash identifying the request, from LLMCache.make_key
+            
+        Returns:
+            The message content of the completion
+        """
+        inflight = self._inflight.get(request_key)
+        if inflight is not None:
+            logger.debug(f"Joining in-flight request {request_key}")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Only retry on our own if the leading request was cancelled, not this one
+                if not inflight.cancelled():
+                    raise
+                return await self._fetch_content(request_params, request_key)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[request_key] = future
+        try:
+            logger.debug(f"Making request with params: {request_params}")
+            response = await self._create_completion(request_params)
+            content = response.choices[0].message.content
+            future.set_result(content)
+            return content
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case no other request joined
+            future.exception()
+            raise
+        finally:
+            del self._inflight[request_key]
+    
     async def _make_request(
         self, 
         system_prompt: str, 
@@ -123,173 +594,33 @@ class AI:
             Either a string or a validated Pydantic model based on response_model
         """
         try:
-            request_params = {
-                "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": temperature or self.temperature,
-            }
+            request_params = self.build_request_params(system_prompt, user_prompt, response_format, temperature)
+            temperature = request_params["temperature"]
             
-            # Add response format if specified
-            if response_format:
-                request_params["response_format"] = {"type": response_format}
+            request_key = LLMCache.make_key(
+                self.model_name,
+                request_params["messages"],
+                temperature,
+                response_format
+            )
             
-            logger.debug(f"Making request with params: {request_params}")
+            # Only deterministic requests are cached unless cache_all is set
+            use_cache = self.cache is not None and (temperature == 0 or self.cache_all)
+            content = await self.cache.get(request_key) if use_cache else None
             
-            response = await self.client.chat.completions.create(**request_params)
-            content = response.choices[0].message.content
+            if content is None:
+                content = await self._fetch_content(request_params, request_key)
+                
+                if use_cache and content is not None:
+                    await self.cache.set(request_key, content)
+            else:
+                logger.debug(f"Using cached response for {request_key}")
             
             # Validate and convert to Pydantic model if specified
-            if response_model and response_format == "json_object":
-                try:
-                    parsed_content = json.loads(content)
-                    
-                    # Preprocess StoryResponse to fix common validation issues
-                    if response_model == StoryResponse:
-                        # Ensure theme field exists
-                        if "theme" not in parsed_content:
-                            # Try to extract theme from plot summary or setting
-                            if "plot_summary" in parsed_content:
-                                parsed_content["theme"] = "Themes derived from the plot"
-                            elif "setting" in parsed_content and isinstance(parsed_content["setting"], dict) and parsed_content["setting"]:
-                                parsed_content["theme"] = "Themes related to the setting"
-                            else:
-                                parsed_content["theme"] = "Adventure and discovery"
-                        
-                        # Ensure mood field exists
-                        if "mood" not in parsed_content:
-                            # Try to infer mood from other fields
-                            if "plot_summary" in parsed_content and "tragic" in parsed_content["plot_summary"].lower():
-                                parsed_content["mood"] = "Somber and reflective"
-                            elif "plot_summary" in parsed_content and ("action" in parsed_content["plot_summary"].lower() or "battle" in parsed_content["plot_summary"].lower()):
-                                parsed_content["mood"] = "Intense and dramatic"
-                            else:
-                                parsed_content["mood"] = "Balanced mix of light and serious moments"
-                        
-                        # Add missing required fields
-                        if "main_characters" not in parsed_content:
-                            parsed_content["main_characters"] = [{"name": "Protagonist", "description": "Main character of the story"}]
-                            
-                        if "plot_summary" not in parsed_content:
-                            if "setting" in parsed_content and isinstance(parsed_content["setting"], dict):
-                                setting_desc = ""
-                                if "description" in parsed_content["setting"]:
-                                    setting_desc = parsed_content["setting"]["description"]
-                                elif "timePeriod" in parsed_content["setting"]:
-                                    setting_desc = f"Set in {parsed_content['setting']['timePeriod']}"
-                                parsed_content["plot_summary"] = f"A story set in {setting_desc}"
-                            else:
-                                parsed_content["plot_summary"] = "An engaging story with twists and character development"
-                                
-                        if "key_scenes" not in parsed_content:
-                            parsed_content["key_scenes"] = [{"description": "Introduction to the main character and setting"}]
-                    
-                    # Preprocess panel descriptions to fix common validation issues
-                    elif response_model == PanelDescriptionsResponse and "panels" in parsed_content:
-                        for panel in parsed_content["panels"]:
-                            # Ensure characters field exists and is a list
-                            if "characters" not in panel or not isinstance(panel["characters"], list) or not panel["characters"]:
-                                # Extract character names from dialogue if possible
-                                if "dialogue" in panel and panel["dialogue"]:
-                                    if isinstance(panel["dialogue"], str):
-                                        # Try to extract character names from dialogue string
-                                        dialogue_parts = panel["dialogue"].split(":", 1)
-                                        if len(dialogue_parts) > 0:
-                                            panel["characters"] = [dialogue_parts[0].strip()]
-                                        else:
-                                            panel["characters"] = ["Character"]
-                                    elif isinstance(panel["dialogue"], list) and panel["dialogue"] and isinstance(panel["dialogue"][0], dict) and "character" in panel["dialogue"][0]:
-                                        # Extract character names from dialogue list of dicts
-                                        panel["characters"] = list(set([d["character"] for d in panel["dialogue"] if "character" in d]))
-                                    else:
-                                        panel["characters"] = ["Character"]
-                                else:
-                                    panel["characters"] = ["Character"]
-                            
-                            # Ensure dialogue is in the correct format (list of dicts)
-                            if "dialogue" in panel:
-                                if isinstance(panel["dialogue"], str):
-                                    # Handle dialogue as a single string (common format: "Character: Text")
-                                    dialogue_text = panel["dialogue"].strip()
-                                    dialogue_parts = dialogue_text.split(":", 1)
-                                    
-                                    if len(dialogue_parts) > 1:
-                                        character = dialogue_parts[0].strip()
-                                        text = dialogue_parts[1].strip()
-                                        panel["dialogue"] = [{"character": character, "text": text}]
-                                    else:
-                                        # If no character name can be extracted, use a default
-                                        panel["dialogue"] = [{"character": "Character", "text": dialogue_text}]
-                                elif not isinstance(panel["dialogue"], list):
-                                    # Convert any non-list dialogue to a list with a single item
-                                    panel["dialogue"] = [{"character": "Character", "text": str(panel["dialogue"])}]
-                                elif panel["dialogue"] and isinstance(panel["dialogue"][0], str):
-                                    # Convert list of strings to list of dicts
-                                    formatted_dialogue = []
-                                    for dialogue_line in panel["dialogue"]:
-                                        dialogue_parts = dialogue_line.split(":", 1)
-                                        if len(dialogue_parts) > 1:
-                                            character = dialogue_parts[0].strip()
-                                            text = dialogue_parts[1].strip()
-                                            formatted_dialogue.append({"character": character, "text": text})
-                                        else:
-                                            formatted_dialogue.append({"character": "Character", "text": dialogue_line})
-                                    panel["dialogue"] = formatted_dialogue
-                                
-                                # Ensure each dialogue entry has both character and text fields
-                                for i, dialogue_entry in enumerate(panel["dialogue"]):
-                                    if not isinstance(dialogue_entry, dict):
-                                        panel["dialogue"][i] = {"character": "Character", "text": str(dialogue_entry)}
-                                    else:
-                                        if "character" not in dialogue_entry:
-                                            dialogue_entry["character"] = "Character"
-                                        if "text" not in dialogue_entry:
-                                            dialogue_entry["text"] = "..."
-                            
-                            # Ensure special_effects is a list if present
-                            if "special_effects" in panel:
-                                if not isinstance(panel["special_effects"], list):
-                                    # Convert string or other non-list types to a list with one item
-                                    panel["special_effects"] = [str(panel["special_effects"])]
-                            
-                            # Convert panel_size to a valid value
-                            if "panel_size" in panel:
-                                # Map common size names to valid sizes
-                                size_mapping = {
-                                    "full-width": "full",
-                                    "full_width": "full",
-                                    "fullwidth": "full",
-                                    "half-width": "half",
-                                    "half_width": "half",
-                                    "halfwidth": "half",
-                                    "third-width": "third",
-                                    "third_width": "third",
-                                    "thirdwidth": "third",
-                                    "quarter-width": "quarter",
-                                    "quarter_width": "quarter",
-                                    "quarterwidth": "quarter"
-                                }
-                                
-                                panel_size = panel["panel_size"].lower()
-                                if panel_size in size_mapping:
-                                    panel["panel_size"] = size_mapping[panel_size]
-                                elif panel_size not in ["full", "half", "third", "quarter"]:
-                                    # Default to full if unknown size format
-                                    panel["panel_size"] = "full"
-                    
-                    # Use model_validate instead of parse_obj (which is deprecated in newer Pydantic versions)
-                    return response_model.model_validate(parsed_content)
-                except Exception as e:
-                    logger.error(f"Error parsing response as {response_model.__name__}: {str(e)}")
-                    logger.debug(f"Raw response: {content}")
-                    raise ValueError(f"Failed to parse response as {response_model.__name__}: {str(e)}")
-            
-            return content
+            return self._parse_response(content, response_model, response_format)
             
         except (APIError, RateLimitError) as e:
-            logger.warning(f"API error (retrying): {str(e)}")
+            logger.error(f"API error after {self.max_retries} retries: {str(e)}")
             raise
         except Exception as e:
             logger.error(f"Error making request: {str(e)}")
@@ -306,22 +637,24 @@ class AI:
         Returns:
             A validated StoryResponse object with the generated story elements
         """
-        system_message = """
-        You are a professional manga/webtoon writer. Your task is to create a compelling 
-        story outline based on the provided prompt. The outline should include:
-        1. Setting (time period, location)
-        2. Main characters (with brief descriptions)
-        3. Plot summary
-        4. Key scenes that would make good visual panels
-        5. Theme and mood
-        
-        Provide your response as a structured JSON with these elements.
-        """
+        system_message = _SYSTEM_STORY
         
         user_message = prompt
         if additional_context:
             user_message += f"\n\nAdditional context: {additional_context}"
         
+        # Reuse the story of a near-identical earlier prompt if one is cached
+        embedding = None
+        if self.semantic_cache is not None:
+            try:
+                embedding = await self._embed(user_message)
+                cached_story = await self.semantic_cache.get(embedding)
+                if cached_story is not None:
+                    logger.info("Using semantically cached story")
+                    return cached_story
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup failed: {str(e)}")
+        
         try:
             result = await self._make_request(
                 system_message,
@@ -343,6 +676,8 @@ class AI:
                         else:
                             normalized_scenes.append(scene)
                     story_dict["key_scenes"] = normalized_scenes
+                if embedding is not None:
+                    await self.semantic_cache.set(embedding, story_dict)
                 return story_dict
             return result
             
@@ -365,24 +700,8 @@ class AI:
         Returns:
             A list of validated PanelDescription objects
         """
-        system_message = """
-        You are a professional manga/webtoon artist and writer. Your task is to create detailed 
-        panel descriptions based on the provided story outline. Each panel description should include:
-        1. Visual description (what should be drawn)
-        2. Characters present
-        3. Dialogue (if any)
-        4. Special effects or text elements
-        5. Panel size recommendation (full-width, half-width, etc.)
-        
-        Format your response as a JSON object with a "panels" array containing panel objects.
-        """
-        
-        user_message = f"""
-        Story outline: {json.dumps(story)}
-        
-        Create {num_panels} panel descriptions for this story that would make a compelling manga/webtoon.
-        Make sure the panels flow logically and capture key moments from the story.
-        """
+        system_message = _SYSTEM_PANELS
+        user_message = self._panel_descriptions_prompt(story, num_panels)
         
         try:
             result = await self._make_request(
@@ -393,14 +712,116 @@ class AI:
             )
             
             if isinstance(result, PanelDescriptionsResponse):
-                # Use model_dump instead of dict() (which is deprecated in newer Pydantic versions)
-                return [panel.model_dump() for panel in result.panels]
+                # Dump the whole response in one call instead of once per panel
+                return result.model_dump()["panels"]
             return result
             
         except Exception as e:
             logger.error(f"Error generating panel descriptions: {str(e)}")
             raise
     
+    async def generate_panel_descriptions_stream(
+        self,
+        story: Dict[str, Any],
+        num_panels: int,
+        parse_every: int = 8
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream panel descriptions from the story outline as the model writes them.
+        
+        The response is parsed incrementally, and each panel is yielded once the next
+        panel has started (or the response has ended), so callers can start work on the
+        first panels while later ones are still being generated.
+        
+        Args:
+            story: The story outline dictionary
+            num_panels: The desired number of panels
+            parse_every: Number of received chunks between partial parses
+            
+        Yields:
+            Validated panel description dictionaries, in order
+        """
+        request_params = self.build_request_params(
+            _SYSTEM_PANELS,
+            self._panel_descriptions_prompt(story, num_panels),
+            response_format="json_object"
+        )
+        
+        # Share the response cache with non-streamed requests, a hit yields every panel at once
+        request_key = LLMCache.make_key(
+            self.model_name,
+            request_params["messages"],
+            request_params["temperature"],
+            "json_object"
+        )
+        use_cache = self.cache is not None and (request_params["temperature"] == 0 or self.cache_all)
+        cached = await self.cache.get(request_key) if use_cache else None
+        request_params["stream"] = True
+        
+        buffer = bytearray(cached.encode()) if cached is not None else bytearray()
+        emitted = 0
+        
+        def complete_panels(final: bool) -> List[Any]:
+            """Return panels not yet emitted whose JSON is fully received"""
+            try:
+                parsed = from_json(bytes(buffer), allow_partial=not final)
+            except ValueError:
+                if final:
+                    raise
+                return []
+            panels = parsed.get("panels", []) if isinstance(parsed, dict) else []
+            # The last panel of a partial document may still be incomplete
+            return panels[emitted:] if final else panels[emitted:-1]
+        
+        try:
+            if cached is not None:
+                logger.debug(f"Using cached panel descriptions for {request_key}")
+                for panel in complete_panels(final=True):
+                    emitted += 1
+                    yield PanelDescription.model_validate(panel).model_dump()
+                return
+            
+            stream = await self._create_completion(request_params)
+            chunk_count = 0
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                buffer += chunk.choices[0].delta.content.encode()
+                chunk_count += 1
+                if chunk_count % parse_every:
+                    continue
+                for panel in complete_panels(final=False):
+                    emitted += 1
+                    yield PanelDescription.model_validate(panel).model_dump()
+            
+            for panel in complete_panels(final=True):
+                emitted += 1
+                yield PanelDescription.model_validate(panel).model_dump()
+            
+            # Only complete, valid responses reach this point
+            if use_cache:
+                await self.cache.set(request_key, buffer.decode())
+                
+        except Exception as e:
+            logger.error(f"Error streaming panel descriptions: {str(e)}")
+            raise
+    
+    @staticmethod
+    def _panel_descriptions_prompt(story: Dict[str, Any], num_panels: int) -> str:
+        """
+        Build the user prompt for panel description generation.
+        
+        Args:
+            story: The story outline dictionary
+            num_panels: The desired number of panels
+            
+        Returns:
+            The user prompt, with the story outline last so the instructions stay a cacheable prefix
+        """
+        # Leave out bookkeeping fields, a per-generation timestamp would make every prompt unique
+        outline = {key: value for key, value in story.items() if key not in _STORY_BOOKKEEPING_FIELDS}
+        return _panel_user_prefix(num_panels) + orjson.dumps(outline, option=orjson.OPT_NON_STR_KEYS).decode()
+    
     async def generate_image_prompt(
         self, 
         panel_description: str,
@@ -418,26 +839,14 @@ class AI:
         Returns:
             A detailed prompt for image generation
         """
-        system_message = """
-        You are a professional manga/webtoon artist. Your task is to create a detailed prompt 
-        for an image generation AI based on the panel description provided. The prompt should be 
-        detailed and specific, including:
-        1. Scene description
-        2. Character positions and expressions
-        3. Lighting and atmosphere
-        4. Art style references
-        5. Composition details
-        
-        The prompt should be detailed yet concise, optimized for image generation AI.
-        """
+        system_message = _SYSTEM_IMAGE_PROMPT
         
-        user_message = f"""
-        Panel description: {panel_description}
-        Characters: {', '.join(characters)}
-        Style: {style}
-        
-        Create a detailed image generation prompt that will result in a high-quality {style}-style illustration.
-        """
+        user_message = (
+            f"Create a detailed image generation prompt that will result in a high-quality {style}-style illustration.\n\n"
+            f"Panel description: {panel_description}\n"
+            f"Characters: {', '.join(characters)}\n"
+            f"Style: {style}"
+        )
         
         try:
             result = await self._make_request(
@@ -466,30 +875,13 @@ class AI:
         Returns:
             A list of validated SpeechBubble objects
         """
-        system_message = """
-        You are a professional manga/webtoon editor specializing in text and speech bubble placement.
-        Your task is to determine optimal placement and styling for speech bubbles in a panel.
-        For each dialogue line, provide:
-        1. Position (top-left, center-right, etc.)
-        2. Style (normal, thought, shouted, etc.)
-        3. Tail direction (pointing to which character)
-        4. Character name
-        5. Text content
-        
-        Format your response as a JSON object with a "speechBubbles" array containing objects with fields:
-        - text: The text content of the speech bubble
-        - character: The character speaking
-        - position: Position on panel (top-left, center-right, etc.)
-        - style: Style (normal, thought, shouted)
-        - tail_direction: Direction the tail points
-        """
-        
-        user_message = f"""
-        Panel description: {panel_description}
-        Dialogue lines: {json.dumps(dialogue)}
+        system_message = _SYSTEM_SPEECH_BUBBLES
         
-        Determine the optimal placement and styling for speech bubbles in this panel.
-        """
+        user_message = (
+            "Determine the optimal placement and styling for speech bubbles in this panel.\n\n"
+            f"Panel description: {panel_description}\n"
+            f"Dialogue lines: {orjson.dumps(dialogue, option=orjson.OPT_NON_STR_KEYS).decode()}"
+        )
         
         try:
             result = await self._make_request(
@@ -501,27 +893,53 @@ class AI:
             )
             
             if isinstance(result, SpeechBubblesResponse):
-                # Use model_dump instead of dict() (which is deprecated in newer Pydantic versions)
-                speech_bubbles = [bubble.model_dump() for bubble in result.speechBubbles]
-                
-                # Validate speech bubbles
-                for bubble in speech_bubbles:
-                    if not isinstance(bubble, dict):
-                        raise ValueError("Speech bubble must be a dictionary")
-                    if "text" not in bubble or not isinstance(bubble["text"], str):
-                        raise ValueError("Speech bubble text must be a string")
-                    if "character" not in bubble or not isinstance(bubble["character"], str):
-                        raise ValueError("Speech bubble character must be a string")
-                    if "position" not in bubble or not isinstance(bubble["position"], str):
-                        raise ValueError("Speech bubble position must be a string")
-                    if "style" not in bubble or not isinstance(bubble["style"], str):
-                        raise ValueError("Speech bubble style must be a string")
-                    if "tail_direction" not in bubble or not isinstance(bubble["tail_direction"], str):
-                        raise ValueError("Speech bubble tail direction must be a string")
-                
-                return speech_bubbles
+                # Dump the whole response in one call, field types are already guaranteed by validation
+                return result.model_dump()["speechBubbles"]
             return result
             
         except Exception as e:
             logger.error(f"Error generating speech bubbles: {str(e)}")
+            raise
+    
+    async def generate_speech_bubbles_batch(
+        self,
+        panels: List[Tuple[str, List[Dict[str, str]]]]
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Generate speech bubble placements and styles for several panels in one request.
+        
+        Args:
+            panels: List of (panel description, dialogue) pairs
+            
+        Returns:
+            Speech bubble dicts for each input panel in order, None for panels missing from the response
+        """
+        panel_blocks = "\n\n".join(
+            f"Panel {number}: {description}\n"
+            f"Dialogue lines: {orjson.dumps(dialogue, option=orjson.OPT_NON_STR_KEYS).decode()}"
+            for number, (description, dialogue) in enumerate(panels, 1)
+        )
+        user_message = (
+            "Determine the optimal placement and styling for speech bubbles in each of these panels.\n\n"
+            f"{panel_blocks}"
+        )
+        
+        try:
+            result = await self._make_request(
+                _SYSTEM_SPEECH_BUBBLES_BATCH,
+                user_message,
+                response_model=SpeechBubblesBatchResponse,
+                response_format="json_object",
+                temperature=0.5,
+            )
+            
+            # Match entries by panel number, the model may skip or reorder panels
+            bubbles: List[Optional[List[Dict[str, Any]]]] = [None] * len(panels)
+            for entry in result.model_dump()["panels"]:
+                if 1 <= entry["panel"] <= len(panels):
+                    bubbles[entry["panel"] - 1] = entry["speechBubbles"]
+            return bubbles
+            
+        except Exception as e:
+            logger.error(f"Error generating batched speech bubbles: {str(e)}")
             raise
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+Response caches for language model requests
+"""
+import copy
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import orjson
+
+from utils.store import Store
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """
+    In-process cache of raw model responses keyed by a hash of the request
+
+    Raw content strings are cached rather than parsed models, so responses
+    still go through validation when they are read back.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Initialize the cache
+
+        Args:
+            maxsize: Maximum number of cached responses
+            ttl: Optional time-to-live in seconds for each response
+        """
+        self._store = Store(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        response_format: Optional[str] = None
+    ) -> str:
+        """
+        Build the cache key for a request
+
+        Args:
+            model: Name of the language model
+            messages: Messages sent to the model
+            temperature: Sampling temperature
+            response_format: Optional response format specification
+
+        Returns:
+            SHA-256 hex digest identifying the request
+        """
+        payload = orjson.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "response_format": response_format,
+            },
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return hashlib.sha256(payload).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            The cached response content, or None on a miss
+        """
+        return self._store.get(key)
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        Cache a response
+
+        Args:
+            key: Cache key from make_key
+            value: Raw response content
+        """
+        self._store.set(key, value)
+
+
+class SemanticCache:
+    """
+    Cache of responses keyed by prompt embeddings
+
+    A lookup returns the response of the most similar cached prompt when the
+    cosine similarity reaches ``threshold``. Embeddings are stored normalized
+    in a single matrix, so a lookup is one matrix-vector product over all entries.
+    """
+
+    def __init__(self, maxsize: int = 10000, threshold: float = 0.93):
+        """
+        Initialize the cache
+
+        Args:
+            maxsize: Maximum number of cached responses, least recently used are replaced first
+            threshold: Minimum cosine similarity for a cache hit
+        """
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._embeddings: Optional[np.ndarray] = None
+        self._responses: List[Any] = []
+        self._last_used: Optional[np.ndarray] = None
+        self._clock = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        """
+        Convert an embedding to a unit-length float32 vector
+
+        Args:
+            embedding: Embedding returned by the embeddings API
+
+        Returns:
+            Normalized embedding
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def get(self, embedding: Sequence[float]) -> Optional[Any]:
+        """
+        Get the response cached for the most similar prompt
+
+        Args:
+            embedding: Embedding of the new prompt
+
+        Returns:
+            A copy of the cached response, or None when no entry is similar enough
+        """
+        if not self._responses:
+            return None
+
+        query = self._normalize(embedding)
+        similarities = self._embeddings[:len(self._responses)] @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        self._clock += 1
+        self._last_used[best] = self._clock
+        logger.debug(f"Semantic cache hit with similarity {similarities[best]:.3f}")
+        # Callers mutate returned responses, so never hand out the cached object itself
+        return copy.deepcopy(self._responses[best])
+
+    async def set(self, embedding: Sequence[float], value: Any) -> None:
+        """
+        Cache a response for a prompt embedding
+
+        Args:
+            embedding: Embedding of the prompt
+            value: Response to cache
+        """
+        vector = self._normalize(embedding)
+        value = copy.deepcopy(value)
+        self._clock += 1
+
+        size = len(self._responses)
+        if size < self.maxsize:
+            if self._embeddings is None or size == len(self._embeddings):
+                # Grow the preallocated matrices geometrically instead of copying on every insert
+                capacity = min(self.maxsize, max(16, size * 2))
+                embeddings = np.zeros((capacity, vector.shape[0]), dtype=np.float32)
+                last_used = np.zeros(capacity, dtype=np.int64)
+                if self._embeddings is not None:
+                    embeddings[:size] = self._embeddings
+                    last_used[:size] = self._last_used
+                self._embeddings, self._last_used = embeddings, last_used
+            slot = size
+            self._responses.append(value)
+        else:
+            # Replace the least recently used entry in place
+            slot = int(np.argmin(self._last_used))
+            self._responses[slot] = value
+
+        self._embeddings[slot] = vector
+        self._last_used[slot] = self._clock
@@ -1,11 +1,40 @@
 """
 File management module for handling files and directories
 """
+import asyncio
+import logging
+import mmap
 import os
-import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
 
+import aiofiles
+import orjson
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Threads reading files in load_from_disk, file reads release the GIL and overlap
+READ_WORKERS = 8
+
+def _read_text(file_path: Path) -> Optional[str]:
+    """
+    Read a text file, reporting errors instead of raising them
+    
+    Args:
+        file_path: Path of the file to read
+        
+    Returns:
+        Content of the file, or None if it could not be read
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except Exception as e:
+        logger.warning(f"Error loading file {file_path}: {str(e)}")
+        return None
+
 class FilesDict(dict):
     """
     A dictionary-based container for managing files
@@ -13,8 +42,42 @@ class FilesDict(dict):
     This class extends the standard dictionary to enforce string keys and values,
     representing filenames and their corresponding content. It provides methods
     to format its contents and to enforce type checks on keys and values.
+    
+    A FilesDict created by load_mmapped is read-only: its values are memory maps
+    of the files, decoded only when accessed by key (items() and values() return
+    the maps themselves).
     """
     
+    read_only = False
+    
+    def __getitem__(self, key: str) -> str:
+        """
+        Get the content for the given filename, decoding memory-mapped files
+        
+        Args:
+            key: The filename
+            
+        Returns:
+            The file content
+        """
+        value = super().__getitem__(key)
+        if isinstance(value, mmap.mmap):
+            return value[:].decode('utf-8')
+        return value
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get the content for the given filename, or a default if it is missing
+        
+        Args:
+            key: The filename
+            default: Value returned when the filename is missing
+            
+        Returns:
+            The file content or the default
+        """
+        return self[key] if key in self else default
+    
     def __setitem__(self, key: Union[str, Path], value: str):
         """
         Set the content for the given filename, enforcing type checks
@@ -24,14 +87,28 @@ class FilesDict(dict):
             value: The content to associate with the filename
             
         Raises:
-            TypeError: If the key is not a string or Path, or if the value is not a string
+            TypeError: If the FilesDict is read-only, the key is not a string or Path, or the value is not a string
         """
+        if self.read_only:
+            raise TypeError("FilesDict is read-only")
         if not isinstance(key, (str, Path)):
             raise TypeError("Keys must be strings or Path objects")
         if not isinstance(value, str):
             raise TypeError("Values must be strings")
         super().__setitem__(str(key), value)
     
+    def _set_raw(self, key: str, value: str):
+        """
+        Set the content for a filename without type checks
+        
+        Only for internal bulk builders whose keys and values are already strings.
+        
+        Args:
+            key: The filename as a key for the content
+            value: The content to associate with the filename
+        """
+        dict.__setitem__(self, key, value)
+    
     def to_dict(self) -> Dict[str, str]:
         """
         Convert the files dictionary to a plain dictionary
@@ -39,7 +116,46 @@ class FilesDict(dict):
         Returns:
             A plain dictionary with the same keys and values
         """
-        return {str(k): v for k, v in self.items()}
+        return {str(k): self[k] for k in self}
+    
+    def get_bytes(self, key: str) -> bytes:
+        """
+        Get the content for the given filename as UTF-8 bytes, without decoding memory-mapped files
+        
+        Args:
+            key: The filename
+            
+        Returns:
+            The encoded file content
+        """
+        value = super().__getitem__(key)
+        if isinstance(value, mmap.mmap):
+            return value[:]
+        return value.encode('utf-8')
+    
+    def close(self):
+        """Release the memory maps of a FilesDict created by load_mmapped"""
+        for value in dict.values(self):
+            if isinstance(value, mmap.mmap):
+                value.close()
+    
+    def _make_dirs(self, base_path: Path) -> Dict[str, Path]:
+        """
+        Create the directories needed to save all files, each one only once
+        
+        Args:
+            base_path: Base path files are saved to
+            
+        Returns:
+            Mapping of each filename to the path it is saved at
+        """
+        paths = {filename: base_path / filename for filename in self}
+        
+        # Parents before children, so every mkdir call after the first finds its parent
+        for directory in sorted({path.parent for path in paths.values()} | {base_path}, key=lambda p: len(p.parts)):
+            directory.mkdir(parents=True, exist_ok=True)
+        
+        return paths
     
     def save_to_disk(self, base_path: Union[str, Path]):
         """
@@ -48,15 +164,25 @@ class FilesDict(dict):
         Args:
             base_path: Base path to save files to
         """
-        base_path = Path(base_path)
-        base_path.mkdir(parents=True, exist_ok=True)
+        paths = self._make_dirs(Path(base_path))
         
-        for filename, content in self.items():
-            file_path = base_path / filename
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+        for filename in self:
+            paths[filename].write_bytes(self.get_bytes(filename))
+    
+    async def asave_to_disk(self, base_path: Union[str, Path]):
+        """
+        Save all files to disk without blocking the event loop
+        
+        Args:
+            base_path: Base path to save files to
+        """
+        paths = await asyncio.to_thread(self._make_dirs, Path(base_path))
+        
+        async def write(file_path: Path, content: bytes):
+            async with aiofiles.open(file_path, 'wb') as f:
+                await f.write(content)
+        
+        await asyncio.gather(*(write(paths[filename], self.get_bytes(filename)) for filename in self))
     
     @classmethod
     def load_from_disk(cls, base_path: Union[str, Path], pattern: str = "*") -> 'FilesDict':
@@ -73,20 +199,70 @@ class FilesDict(dict):
         base_path = Path(base_path)
         files_dict = cls()
         
+        file_paths = [file_path for file_path in base_path.glob(pattern) if file_path.is_file()]
+        if len(file_paths) > 1:
+            with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+                contents = list(executor.map(_read_text, file_paths))
+        else:
+            contents = [_read_text(file_path) for file_path in file_paths]
+        
+        for file_path, content in zip(file_paths, contents):
+            if content is not None:
+                # Store with relative path as key
+                relative_path = file_path.relative_to(base_path)
+                files_dict._set_raw(str(relative_path), content)
+        
+        return files_dict
+    
+    @classmethod
+    def load_mmapped(cls, base_path: Union[str, Path], pattern: str = "*") -> 'FilesDict':
+        """
+        Load files from disk into a read-only FilesDict backed by memory maps
+        
+        File contents stay in the OS page cache, shared across processes, and are
+        only decoded when accessed. Call close() to release the maps.
+        
+        Args:
+            base_path: Base path to load files from
+            pattern: Glob pattern to match files
+            
+        Returns:
+            Read-only FilesDict with memory-mapped files
+        """
+        base_path = Path(base_path)
+        files_dict = cls()
+        
         for file_path in base_path.glob(pattern):
-            if file_path.is_file():
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Store with relative path as key
-                    relative_path = file_path.relative_to(base_path)
-                    files_dict[str(relative_path)] = content
-                except Exception as e:
-                    print(f"Error loading file {file_path}: {str(e)}")
+            if not file_path.is_file():
+                continue
+            relative_path = str(file_path.relative_to(base_path))
+            try:
+                with open(file_path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size == 0:
+                        # Empty files cannot be mapped
+                        files_dict._set_raw(relative_path, "")
+                    else:
+                        files_dict._set_raw(relative_path, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except Exception as e:
+                logger.warning(f"Error loading file {file_path}: {str(e)}")
         
+        files_dict.read_only = True
         return files_dict
     
+    @classmethod
+    async def aload_from_disk(cls, base_path: Union[str, Path], pattern: str = "*") -> 'FilesDict':
+        """
+        Load files from disk into a FilesDict without blocking the event loop
+        
+        Args:
+            base_path: Base path to load files from
+            pattern: Glob pattern to match files
+            
+        Returns:
+            FilesDict with loaded files
+        """
+        return await asyncio.to_thread(cls.load_from_disk, base_path, pattern)
+    
     def save_metadata(self, metadata_path: Union[str, Path], metadata: Dict[str, Any]):
         """
         Save metadata associated with the files
@@ -98,8 +274,7 @@ class FilesDict(dict):
         metadata_path = Path(metadata_path)
         metadata_path.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2)
+        metadata_path.write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     
     @classmethod
     def load_metadata(cls, metadata_path: Union[str, Path]) -> Dict[str, Any]:
@@ -118,8 +293,7 @@ class FilesDict(dict):
             return {}
         
         try:
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return orjson.loads(metadata_path.read_bytes())
         except Exception as e:
-            print(f"Error loading metadata from {metadata_path}: {str(e)}")
+            logger.warning(f"Error loading metadata from {metadata_path}: {str(e)}")
             return {}
\ No newline at end of file
@@ -3,13 +3,44 @@ HTML renderer module for generating the final webtoon HTML output
 """
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
+
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup, escape
+
 from models.panel import Panel
 from models.speech_bubble import SpeechBubble
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "../templates")
+
+# Page shell with the static CSS, compiled once at import; panels are rendered into it as markup
+_templates = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=True,
+    keep_trailing_newline=True,
+    auto_reload=False,
+)
+_WEBTOON_TEMPLATE = _templates.get_template("webtoon.html")
+
+# CSS for every "vertical[-horizontal]" position string accepted by SpeechBubble
+_POSITION_STYLES = {
+    "top": "top: 10%;",
+    "top-left": "top: 10%;left: 10%;",
+    "top-center": "top: 10%;left: 50%; transform: translateX(-50%);",
+    "top-right": "top: 10%;right: 10%;",
+    "center": "top: 50%; left: 50%; transform: translate(-50%, -50%);",
+    "center-left": "left: 10%;top: 50%; transform: translateY(-50%);",
+    "center-center": "top: 50%; transform: translateY(-50%);",
+    "center-right": "right: 10%;top: 50%; transform: translateY(-50%);",
+    "bottom": "bottom: 10%;",
+    "bottom-left": "bottom: 10%;left: 10%;",
+    "bottom-center": "bottom: 10%;left: 50%; transform: translateX(-50%);",
+    "bottom-right": "bottom: 10%;right: 10%;",
+}
+
 class HTMLRenderer:
     """
     Renders panels and speech bubbles into HTML format for webtoon display
@@ -17,7 +48,7 @@ class HTMLRenderer:
     
     def __init__(self):
         """Initialize the HTML renderer"""
-        self.template_dir = os.path.join(os.path.dirname(__file__), "../templates")
+        self.template_dir = TEMPLATE_DIR
         logger.info("HTMLRenderer initialized")
         
     def render_webtoon(
@@ -39,171 +70,178 @@ class HTMLRenderer:
         """
         logger.info(f"Rendering webtoon HTML with {len(panels)} panels")
         
-        html = self._get_html_header(title)
-        
-        # Add story container
-        html += '<div class="webtoon-container">\n'
+        html = _WEBTOON_TEMPLATE.render(
+            title=title,
+            panel_content=self._iter_panels(panels),
+            timestamp=timestamp or ""
+        )
         
-        # Add title section
-        html += f'''<div class="webtoon-title">
-    <h1>{title}</h1>
-</div>\n'''
-        
-        # Render each panel
-        panel_content = ""
-        for panel in panels:
-            panel_content += self._render_panel(panel)
+        logger.info("HTML rendering completed")
+        return html
+    
+    def render_webtoon_stream(
+        self, 
+        panels: List[Panel], 
+        title: str = "SketchDojo Webtoon", 
+        timestamp: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Render a complete webtoon from panels into HTML chunks
         
-        html += panel_content
+        Panels are rendered lazily as the chunks are consumed, so only one
+        panel's markup is held in memory at a time.
         
-        # Close story container
-        html += '</div>\n'
+        Args:
+            panels: List of Panel objects to render
+            title: Title of the webtoon
+            timestamp: Optional timestamp for the webtoon
+            
+        Returns:
+            Iterator over the HTML chunks of the complete webtoon
+        """
+        logger.info(f"Streaming webtoon HTML with {len(panels)} panels")
         
-        # Add footer
-        footer_timestamp = timestamp or ""
-        html += self._get_html_footer(footer_timestamp)
+        return _WEBTOON_TEMPLATE.generate(
+            title=title,
+            panel_content=self._iter_panels(panels),
+            timestamp=timestamp or ""
+        )
+    
+    def _iter_panels(self, panels: List[Panel]) -> Iterator[Markup]:
+        """
+        Render panels one at a time for the page template
         
-        logger.info("HTML rendering completed")
-        return html
+        Args:
+            panels: List of Panel objects to render
+            
+        Returns:
+            Iterator over the markup of each panel
+        """
+        for panel in panels:
+            # Fragments of a panel are collected in one list and joined once
+            parts = []
+            self._render_panel(panel, parts)
+            yield Markup("".join(parts))
     
-    def _render_panel(self, panel: Panel) -> str:
+    def _render_panel(self, panel: Panel, parts: List[str]) -> None:
         """
         Render a single panel to HTML
         
         Args:
             panel: Panel object to render
-            
-        Returns:
-            HTML string for the panel
+            parts: List the HTML fragments are appended to
         """
-        # Determine panel class based on panel size
-        panel_size = getattr(panel, 'size', 'full')
-        panel_class = f"panel panel-{panel_size}"
+        panel_id = panel.panel_id
         
-        html = f'<div id="panel-{panel.panel_id}" class="{panel_class}">\n'
+        # Determine panel class based on panel size
+        parts.append(f'<div id="panel-{panel_id}" class="panel panel-{panel.size}">')
         
         # Add panel image
-        image_path = getattr(panel, 'image_path', None)
+        image_path = panel.image_path
         if image_path:
-            # Don't add leading slash if it's a full URL
-            if image_path.startswith('http://') or image_path.startswith('https://'):
-                image_url = image_path
-            else:
-                # For relative paths, add a leading slash if it doesn't have one
-                image_url = f"/{image_path}" if not image_path.startswith('/') else image_path
-                
-            html += f'  <div class="panel-image"><img src="{image_url}" alt="Panel {panel.panel_id}"></div>\n'
+            # Full URLs and root-relative paths are kept as is, relative paths get a leading slash.
+            # Panels are built with model_construct and image_path is assigned later, so no validator sees it.
+            image_url = image_path if image_path.startswith(('http://', 'https://', '/')) else f"/{image_path}"
+            parts.append(f'<div class="panel-image"><img src="{image_url}" alt="Panel {panel_id}"></div>')
         
         # Add speech bubbles
-        speech_bubbles = getattr(panel, 'speech_bubbles', [])
-        if speech_bubbles:
-            html += self._render_speech_bubbles(panel)
+        if panel.speech_bubbles:
+            self._render_speech_bubbles(panel, parts)
         
         # Add caption if any
-        caption = getattr(panel, 'caption', None)
+        caption = panel.caption
         if caption:
-            html += f'  <div class="caption">{caption}</div>\n'
+            parts.append(f'<div class="caption">{escape(caption)}</div>')
         
         # Add sound effects if any
-        effects = getattr(panel, 'effects', [])
+        effects = panel.effects
         if effects:
-            html += self._render_effects(effects)
+            self._render_effects(effects, parts)
         
-        html += '</div>\n'
-        return html
+        parts.append('</div>\n')
     
-    def _render_speech_bubbles(self, panel: Panel) -> str:
+    def _render_speech_bubbles(self, panel: Panel, parts: List[str]) -> None:
         """
         Render speech bubbles for a panel
         
         Args:
             panel: Panel containing speech bubbles
-            
-        Returns:
-            HTML string for speech bubbles
+            parts: List the HTML fragments are appended to
         """
-        html = ""
-        
         # If panel has structured speech bubble objects
-        speech_bubbles = getattr(panel, 'speech_bubbles', [])
+        speech_bubbles = panel.speech_bubbles
         if speech_bubbles:
-            for bubble in speech_bubbles:
-                style = getattr(bubble, 'style', 'normal')
-                bubble_class = f"speech-bubble {style}"
-                
-                # Get position information
-                position = getattr(bubble, 'position', 'top-left')
-                position_style = self._get_position_style(bubble)
-                
-                # Get character
-                character = getattr(bubble, 'character', 'Character')
-                
-                # Get text
-                text = getattr(bubble, 'text', '')
-                
-                # Get tail direction
-                tail_direction = getattr(bubble, 'tail_direction', 'bottom')
-                
-                html += f'  <div class="{bubble_class}" style="{position_style}" data-character="{character}">\n'
-                html += f'    <div class="speech-content">{text}</div>\n'
-                html += f'    <div class="speech-tail speech-tail-{tail_direction}"></div>\n'
-                html += '  </div>\n'
+            get_position_style = self._get_position_style
+            parts.extend([
+                f'<div class="speech-bubble {bubble.style}" style="{get_position_style(bubble)}" data-character="{escape(bubble.character)}">'
+                f'<div class="speech-content">{escape(bubble.text)}</div>'
+                f'<div class="speech-tail speech-tail-{bubble.tail_direction}"></div>'
+                '</div>'
+                for bubble in speech_bubbles
+            ])
+            return
         
         # If panel just has dialogue list without structured bubbles
-        elif hasattr(panel, 'dialogue') and panel.dialogue:
-            dialogue = panel.dialogue
-            for i, dialogue_item in enumerate(dialogue):
-                if isinstance(dialogue_item, dict) and 'text' in dialogue_item and 'character' in dialogue_item:
-                    character = dialogue_item['character']
-                    text = dialogue_item['text']
-                else:
-                    # Simple string dialogue
-                    character = f"character-{i+1}"
-                    text = str(dialogue_item)
-                
-                # Simple top-to-bottom layout
-                top_position = 10 + (i * 20)
-                left_position = 10 + (i * 5)
-                position_style = f"top: {top_position}%; left: {left_position}%;"
-                
-                html += f'  <div class="speech-bubble" style="{position_style}" data-character="{character}">\n'
-                html += f'    <div class="speech-content">{text}</div>\n'
-                html += '    <div class="speech-tail speech-tail-bottom"></div>\n'
-                html += '  </div>\n'
-        
-        return html
+        dialogue = panel.dialogue
+        if not dialogue:
+            return
+        
+        # Dialogue is normally either all structured lines or all plain strings, so check the whole list once
+        if all(isinstance(item, dict) and 'text' in item and 'character' in item for item in dialogue):
+            lines = [(item['character'], item['text']) for item in dialogue]
+        else:
+            lines = [
+                (item['character'], item['text'])
+                if isinstance(item, dict) and 'text' in item and 'character' in item
+                # Simple string dialogue
+                else (f"character-{i+1}", str(item))
+                for i, item in enumerate(dialogue)
+            ]
+        
+        # Simple top-to-bottom layout
+        parts.extend([
+            f'<div class="speech-bubble" style="top: {10 + i * 20}%; left: {10 + i * 5}%;" data-character="{escape(character)}">'
+            f'<div class="speech-content">{escape(text)}</div>'
+            '<div class="speech-tail speech-tail-bottom"></div>'
+            '</div>'
+            for i, (character, text) in enumerate(lines)
+        ])
     
-    def _render_effects(self, effects: List[Dict[str, Any]]) -> str:
+    def _render_effects(self, effects: List[Dict[str, Any]], parts: List[str]) -> None:
         """
         Render special effects for a panel
         
         Args:
             effects: List of effect dictionaries
-            
-        Returns:
-            HTML string for effects
+            parts: List the HTML fragments are appended to
         """
-        html = ""
+        # Effects are validated as dictionaries by the Panel model, so check the whole list once.
+        # Positions and styles come from the model too, so they are escaped like the text
+        if all(isinstance(effect, dict) for effect in effects):
+            parts.extend([
+                f'<div class="sound-effect" style="top: {escape(effect.get("top", "50%"))}; left: {escape(effect.get("left", "50%"))}; '
+                f'{"; ".join([f"{escape(k)}: {escape(v)}" for k, v in effect.get("style", {}).items()])}">{escape(effect.get("text", ""))}</div>'
+                for effect in effects
+            ])
+            return
         
         for effect in effects:
             if isinstance(effect, str):
                 # Simple string effect
-                html += f'  <div class="sound-effect" style="top: 50%; left: 50%;">{effect}</div>\n'
+                parts.append(f'<div class="sound-effect" style="top: 50%; left: 50%;">{escape(effect)}</div>')
             elif isinstance(effect, dict):
                 # Dictionary with position and text
                 text = effect.get('text', '')
                 
                 # Get position
-                top = effect.get('top', '50%')
-                left = effect.get('left', '50%')
+                top = escape(effect.get('top', '50%'))
+                left = escape(effect.get('left', '50%'))
                 
                 # Get style
                 style_dict = effect.get('style', {})
-                style_str = '; '.join([f"{k}: {v}" for k, v in style_dict.items()])
+                style_str = '; '.join([f"{escape(k)}: {escape(v)}" for k, v in style_dict.items()])
                 
-                html += f'  <div class="sound-effect" style="top: {top}; left: {left}; {style_str}">{text}</div>\n'
-        
-        return html
+                parts.append(f'<div class="sound-effect" style="top: {top}; left: {left}; {style_str}">{escape(text)}</div>')
     
     def _get_position_style(self, bubble: SpeechBubble) -> str:
         """
@@ -215,272 +253,14 @@ class HTMLRenderer:
         Returns:
             CSS style string
         """
-        position_style = ""
-        
-        position = getattr(bubble, 'position', None)
-        if position:
-            # Handle different position formats
-            if isinstance(position, dict):
-                for prop, value in position.items():
-                    position_style += f"{prop}: {value};"
-            elif isinstance(position, str):
-                # Handle position as a string like "top-left"
-                position_parts = position.split('-')
-                
-                if "top" in position_parts:
-                    position_style += "top: 10%;"
-                if "bottom" in position_parts:
-                    position_style += "bottom: 10%;"
-                if "left" in position_parts:
-                    position_style += "left: 10%;"
-                if "right" in position_parts:
-                    position_style += "right: 10%;"
-                if "center" in position_parts:
-                    if "top" in position_parts or "bottom" in position_parts:
-                        position_style += "left: 50%; transform: translateX(-50%);"
-                    else:
-                        position_style += "top: 50%; transform: translateY(-50%);"
-                        
-                # If just "center", center both horizontally and vertically
-                if position == "center":
-                    position_style = "top: 50%; left: 50%; transform: translate(-50%, -50%);"
-        
-        return position_style
-    
-    def _get_html_header(self, title: str) -> str:
-        """Get the HTML header with CSS styles"""
-        return f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
-    <style>
-        /* Reset and base styles */
-        body, html {{
-            margin: 0;
-            padding: 0;
-            font-family: 'Comic Sans MS', 'Lato', Arial, sans-serif;
-            background-color: #f0f0f0;
-        }}
-        
-        /* Container for the webtoon */
-        .webtoon-container {{
-            max-width: 800px;
-            margin: 0 auto;
-            background: black; /* Change to black like typical webtoons */
-            box-shadow: 0 0 10px rgba(0,0,0,0.2);
-            position: relative;
-            padding: 0; /* Remove padding */
-            font-size: 0; /* Remove any space between inline elements */
-            line-height: 0; /* Remove any space between lines */
-        }}
-        
-        /* Webtoon title styles */
-        .webtoon-title {{
-            padding: 15px 0;
-            text-align: center;
-            background: #000;
-            color: white;
-            font-size: 16px; /* Reset font size for this element */
-            line-height: 1.4; /* Reset line height for this element */
-        }}
-        
-        .webtoon-title h1 {{
-            margin: 0;
-            font-size: 28px;
-            font-family: 'Arial', sans-serif;
-        }}
-        
-        /* Panel styles */
-        .panel {{
-            position: relative;
-            margin: 0;
-            padding: 0;
-            overflow: hidden;
-            display: block;
-        }}
-        
-        .panel-full {{
-            width: 100%;
-        }}
-        
-        .panel-half {{
-            width: 50%;
-            display: inline-block;
-        }}
+        position = bubble.position
         
-        .panel-third {{
-            width: 33.333%;
-            display: inline-block;
-        }}
+        # Handle position as a string like "top-left"
+        if isinstance(position, str):
+            return _POSITION_STYLES.get(position, "")
         
-        .panel-image {{
-            width: 100%;
-        }}
-        
-        .panel-image img {{
-            width: 100%;
-            display: block;
-        }}
-        
-        /* Speech bubble styles */
-        .speech-bubble {{
-            position: absolute;
-            background: white;
-            border-radius: 20px;
-            padding: 10px 15px;
-            max-width: 40%;
-            box-shadow: 0 0 5px rgba(0,0,0,0.2);
-            z-index: 2;
-            font-size: 16px; /* Reset font-size */
-            line-height: 1.4; /* Reset line-height */
-            font-family: 'Comic Sans MS', 'Lato', Arial, sans-serif; /* Reset font */
-        }}
-        
-        .speech-content {{
-            font-size: 1rem;
-            line-height: 1.4;
-        }}
-        
-        .speech-tail {{
-            position: absolute;
-            width: 20px;
-            height: 20px;
-            background: white;
-            transform: rotate(45deg);
-            box-shadow: 0 0 5px rgba(0,0,0,0.2);
-            z-index: 1;
-        }}
-        
-        .speech-tail-left {{
-            left: -5px;
-            top: 50%;
-            margin-top: -10px;
-        }}
-        
-        .speech-tail-right {{
-            right: -5px;
-            top: 50%;
-            margin-top: -10px;
-        }}
-        
-        .speech-tail-top {{
-            top: -5px;
-            left: 50%;
-            margin-left: -10px;
-        }}
-        
-        .speech-tail-bottom {{
-            bottom: -5px;
-            left: 50%;
-            margin-left: -10px;
-        }}
-        
-        /* Speech bubble styles */
-        .speech-bubble.thought {{
-            border-radius: 30px;
-            background: white;
-            border: 2px dashed #ccc;
-        }}
-        
-        .speech-bubble.shout {{
-            background: #ffffcc;
-            border: 2px solid #ffcc00;
-            font-weight: bold;
-        }}
-        
-        .speech-bubble.whisper {{
-            background: #f0f0f0;
-            color: #666;
-            font-style: italic;
-        }}
-        
-        /* Caption styles */
-        .caption {{
-            font-style: italic;
-            text-align: center;
-            padding: 0.5rem;
-            background: rgba(0,0,0,0.7);
-            color: white;
-            position: absolute;
-            bottom: 0;
-            width: 100%;
-            box-sizing: border-box;
-            font-size: 14px; /* Reset font size */
-            line-height: 1.4; /* Reset line height */
-            font-family: 'Comic Sans MS', 'Lato', Arial, sans-serif; /* Reset font */
-        }}
-        
-        /* Footer styles */
-        .webtoon-footer {{
-            padding: 20px;
-            text-align: center;
-            font-size: 14px;
-            line-height: 1.4;
-            color: #999;
-            background: #000;
-            font-family: 'Arial', sans-serif;
-        }}
-        
-        /* Sound effect styles */
-        .sound-effect {{
-            position: absolute;
-            font-family: 'Impact', sans-serif;
-            color: #ff6600;
-            font-weight: bold;
-            font-size: 24px;
-            text-shadow: 2px 2px 0 white, -2px -2px 0 white, 2px -2px 0 white, -2px 2px 0 white;
-            transform: rotate(-15deg);
-            z-index: 3;
-        }}
-        
-        /* Character name tag */
-        .character-name {{
-            position: absolute;
-            background: rgba(0,0,0,0.7);
-            color: white;
-            padding: 3px 8px;
-            border-radius: 4px;
-            font-size: 12px;
-            z-index: 2;
-        }}
-        
-        /* Different panel borders */
-        .panel-normal {{
-            border: 1px solid #ccc;
-        }}
-        
-        .panel-flashback {{
-            border: 2px dashed #999;
-        }}
-        
-        .panel-dream {{
-            border: 3px wavy #9966cc;
-        }}
+        # Handle position as a dict of CSS properties
+        if position:
+            return "".join([f"{escape(prop)}: {escape(value)};" for prop, value in position.items()])
         
-        /* Responsive design */
-        @media (max-width: 600px) {{
-            .panel-half, .panel-third {{
-                width: 100%;
-                display: block;
-            }}
-            
-            .speech-bubble {{
-                max-width: 60%;
-            }}
-        }}
-    </style>
-</head>
-<body>
-"""
-
-    def _get_html_footer(self, timestamp: str) -> str:
-        """Get the HTML footer with timestamp"""
-        return f"""
-    <div class="webtoon-footer">
-        <p>Created with SketchDojo - {timestamp}</p>
-    </div>
-</body>
-</html>
-"""
\ No newline at end of file
+        return ""
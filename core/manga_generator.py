@@ -1,16 +1,18 @@
 """
 Core manga generation module that orchestrates the entire manga creation process
 """
+import asyncio
 import os
-import json
 import aiofiles
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, List, Dict, Any, Optional
+
+import orjson
 
 from core.ai import AI
 from core.html_renderer import HTMLRenderer
-from models.panel import Panel
+from models.panel import Panel, PANEL_LIST_ADAPTER
 from services.story_service import StoryService
 from services.image_service import ImageService
 from services.layout_service import LayoutService
@@ -20,6 +22,9 @@ from config import get_image_url
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Ensure output directories exist
+ensure_directories_exist()
+
 class MangaGenerator:
     """
     Main class that orchestrates the manga/webtoon generation process
@@ -38,9 +43,6 @@ class MangaGenerator:
         self.layout_service = LayoutService()
         self.html_renderer = HTMLRenderer()
         
-        # Ensure output directories exist
-        ensure_directories_exist()
-        
         logger.info("MangaGenerator initialized")
         
     async def generate_story(self, prompt: str, additional_context: Optional[str] = None) -> Dict[str, Any]:
@@ -77,13 +79,38 @@ class MangaGenerator:
         logger.info(f"Generating {num_panels} panels from story")
         panels = await self.story_service.generate_panels(story, num_panels)
         
-        # Apply layout considerations to each panel
+        # Apply layout considerations to all panels, layout rules do no I/O
         logger.info("Applying layout to panels")
         for panel in panels:
-            await self.layout_service.apply_layout(panel)
+            self.layout_service.apply_layout(panel)
             
         return panels
     
+    async def stream_panels(self, story: Dict[str, Any], num_panels: int) -> AsyncIterator[Panel]:
+        """
+        Generate panels from the story, yielding each one as soon as its description arrives
+        
+        Speech bubbles and layout are applied to the yielded panels once the iterator is
+        exhausted, so callers can start per-panel work like image generation in the meantime.
+        
+        Args:
+            story: The story outline dictionary
+            num_panels: The desired number of panels
+            
+        Yields:
+            Panel objects, in order
+        """
+        logger.info(f"Streaming {num_panels} panels from story")
+        panels = []
+        async for panel in self.story_service.stream_panels(story, num_panels):
+            panels.append(panel)
+            yield panel
+        
+        # Layout positions speech bubbles, which are only placed after the last description
+        logger.info("Applying layout to panels")
+        for panel in panels:
+            self.layout_service.apply_layout(panel)
+    
     async def generate_image_for_panel(self, panel: Panel, style: str) -> str:
         """
         Generate an image for a specific panel
@@ -133,29 +160,32 @@ class MangaGenerator:
             Path to the generated HTML file
         """
         # Create a unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"webtoon_{task_id}_{timestamp}.html"
-        output_path = f"static/output/{filename}"
+        timestamp = generate_timestamp()
+        output_path = f"static/output/webtoon_{task_id}_{timestamp}.html"
         
         logger.info(f"Generating HTML output at {output_path}")
         
-        # Generate HTML content
-        html_content = self.html_renderer.render_webtoon(
+        # Generate HTML content, panels are rendered as the file is written
+        html_chunks = self.html_renderer.render_webtoon_stream(
             panels, 
             title=f"SketchDojo Webtoon #{task_id}",
             timestamp=timestamp
         )
         
-        # Save HTML file asynchronously
+        async def write_html() -> None:
+            # Written as UTF-8 bytes, matching the page's charset on every platform
+            async with aiofiles.open(output_path, "wb") as f:
+                for chunk in html_chunks:
+                    await f.write(chunk.encode())
+        
+        # Save HTML file and panel data for reference concurrently
         try:
-            async with aiofiles.open(output_path, "w") as f:
-                await f.write(html_content)
-                
-            # Save panel data for reference
             data_path = f"static/output/data_{task_id}_{timestamp}.json"
-            panel_data = [panel.dict() for panel in panels]
-            
-            await save_data_to_json_async(data_path, panel_data)
+            await asyncio.gather(
+                write_html(),
+                asyncio.to_thread(Path(data_path).write_bytes, PANEL_LIST_ADAPTER.dump_json(panels, indent=2)),
+            )
+            logger.info(f"Data saved to {data_path}")
                 
             logger.info(f"HTML output saved to {output_path}")
             return output_path
@@ -207,9 +237,9 @@ async def save_data_to_json_async(filename: str, data: Any):
         data: Data to save
     """
     try:
-        json_str = json.dumps(data, indent=2)
-        async with aiofiles.open(filename, "w") as f:
-            await f.write(json_str)
+        json_bytes = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        async with aiofiles.open(filename, "wb") as f:
+            await f.write(json_bytes)
         logger.info(f"Data saved to {filename}")
     except Exception as e:
         logger.error(f"Error saving data to {filename}: {str(e)}")
\ No newline at end of file
@@ -3,6 +3,13 @@ Prompt handling module for managing and processing user prompts
 """
 from typing import Dict, Any, Optional, List
 
+# Style instructions appended to the prompt, keyed by lowercase style name
+_STYLE_SUFFIX = {
+    "manga": " Create a manga-style story with black and white panels, dynamic compositions, and expressive characters.",
+    "webtoon": " Create a vertical-scrolling webtoon with colorful panels, clear layouts, and modern character designs.",
+    "comic": " Create a comic book style story with bold outlines, action-packed panels, and traditional comic formatting.",
+}
+
 class Prompt:
     """
     Class for handling and processing user prompts for manga/webtoon generation
@@ -31,6 +38,7 @@ class Prompt:
         self.num_panels = num_panels
         self.characters = characters or []
         self.additional_context = additional_context
+        self._enriched: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -70,25 +78,23 @@ class Prompt:
         """
         Enrich the prompt with style information
         
+        The result is computed on the first call and reused afterwards.
+        
         Returns:
             Enriched prompt string
         """
-        enriched = f"{self.text}"
+        if self._enriched is not None:
+            return self._enriched
         
-        # Add style information
-        if self.style.lower() == "manga":
-            enriched += " Create a manga-style story with black and white panels, dynamic compositions, and expressive characters."
-        elif self.style.lower() == "webtoon":
-            enriched += " Create a vertical-scrolling webtoon with colorful panels, clear layouts, and modern character designs."
-        elif self.style.lower() == "comic":
-            enriched += " Create a comic book style story with bold outlines, action-packed panels, and traditional comic formatting."
+        parts = [self.text, _STYLE_SUFFIX.get(self.style.lower(), "")]
         
         # Add character information if provided
         if self.characters:
-            enriched += f" The story should include these characters: {', '.join(self.characters)}."
+            parts.append(f" The story should include these characters: {', '.join(self.characters)}.")
         
         # Add additional context if provided
         if self.additional_context:
-            enriched += f" {self.additional_context}"
+            parts.append(f" {self.additional_context}")
         
-        return enriched
\ No newline at end of file
+        self._enriched = "".join(parts)
+        return self._enriched
\ No newline at end of file
@@ -1,33 +1,103 @@
 """
 Main entry point for the FastAPI server for manga/webtoon generation
 """
-import os
-from typing import Dict, Any, Optional
+import functools
+import sys
+from contextlib import asynccontextmanager
 
 # Import config to load environment variables
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
 
-from api.routes import router as api_router
+from api.routes import router as api_router, start_generation_task
 from api.chat_routes import router as chat_router
+from config import (
+    MODEL_NAME,
+    MODEL_TEMPERATURE,
+    GENERATION_WORKERS,
+    AI_MAX_CONCURRENCY,
+    OPENAI_RPM,
+    OPENAI_TPM,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_ALL,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+    CHAT_CACHE_SIZE,
+    CHAT_CACHE_THRESHOLD,
+    CORS_ORIGINS,
+)
+from core.ai import AI, create_http_client
+from core.ai_cache import LLMCache, SemanticCache
+from core.chat_ai import ChatAI
+from services.image_service import close_image_session, prepare_placeholder_image
+from utils.helpers import ensure_directories_exist
+from utils.task_queue import TaskQueue
 
-app = FastAPI(title="SketchDojo API", description="API for generating manga/webtoons from prompts", debug=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared AI clients on startup and close their connections on shutdown"""
+    # Resolve the placeholder image before the first request can need it
+    await prepare_placeholder_image()
+    
+    # One pooled HTTP/2 client for every OpenAI call made by this worker
+    app.state.ai = AI(
+        model_name=MODEL_NAME,
+        temperature=MODEL_TEMPERATURE,
+        http_client=create_http_client(),
+        max_concurrency=AI_MAX_CONCURRENCY,
+        rpm=OPENAI_RPM,
+        tpm=OPENAI_TPM,
+        cache=LLMCache(maxsize=LLM_CACHE_SIZE),
+        cache_all=LLM_CACHE_ALL,
+        semantic_cache=(
+            SemanticCache(maxsize=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD)
+            if SEMANTIC_CACHE_SIZE > 0 else None
+        ),
+    )
+    # Generation jobs run on dedicated queue workers, decoupled from request handling
+    app.state.task_queue = TaskQueue(num_workers=GENERATION_WORKERS)
+    app.state.task_queue.start()
+    app.state.chat_ai = ChatAI(
+        app.state.ai,
+        semantic_cache=(
+            SemanticCache(maxsize=CHAT_CACHE_SIZE, threshold=CHAT_CACHE_THRESHOLD)
+            if CHAT_CACHE_SIZE > 0 else None
+        ),
+        # The route layer owns task state, chat tools start generations through it
+        start_generation=functools.partial(
+            start_generation_task, ai=app.state.ai, task_queue=app.state.task_queue
+        ),
+    )
+    try:
+        yield
+    finally:
+        await app.state.task_queue.stop()
+        await app.state.ai.close()
+        await close_image_session()
+
+app = FastAPI(
+    title="SketchDojo API",
+    description="API for generating manga/webtoons from prompts",
+    debug=True,
+    lifespan=lifespan,
+    # Serialize every JSON response with orjson (status polling and chat history dominate traffic)
+    default_response_class=ORJSONResponse,
+)
 
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with your frontend domain
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    # Credentials cannot be combined with a wildcard origin, the API does not use cookies anyway
+    allow_credentials="*" not in CORS_ORIGINS,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
 # Mount static files directory for images and output
-os.makedirs("static/output", exist_ok=True)
-os.makedirs("static/images", exist_ok=True)
+ensure_directories_exist()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Include API routes
@@ -36,14 +106,6 @@ app.include_router(api_router, prefix="/api")
 # Include Chat routes
 app.include_router(chat_router, prefix="/api/chat", tags=["chat"])
 
-# Task storage (in memory for simplicity, use a database in production)
-tasks = {}
-
-class TaskStatus(BaseModel):
-    status: str
-    progress: float = 0.0
-    result: Optional[Dict[str, Any]] = None
-
 @app.get("/")
 async def root():
     return {"message": "Welcome to SketchDojo API"}
@@ -56,11 +118,18 @@ async def health_check():
 # Error handler
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"message": exc.detail},
     )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # uvloop is not available on Windows, fall back to the asyncio loop there
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+    )
\ No newline at end of file
@@ -2,12 +2,14 @@
 Character data model for manga/webtoon characters
 """
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class Character(BaseModel):
     """
     Represents a character in a manga or webtoon
     """
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+    
     name: str
     description: Optional[str] = None
     appearance: Optional[Dict[str, Any]] = None
@@ -16,9 +18,6 @@ class Character(BaseModel):
     
     # Character expressions for consistent rendering
     expressions: Optional[Dict[str, str]] = None
-    
-    class Config:
-        arbitrary_types_allowed = True
         
 class CharacterRequest(BaseModel):
     """
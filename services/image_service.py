@@ -1,21 +1,71 @@
 """
 Image service module for generating manga/webtoon panel images
 """
+import asyncio
 import os
-import base64
 import aiohttp
 import aiofiles
 import logging
+import orjson
+import pybase64
 from typing import List, Optional, Tuple
-from datetime import datetime
+from uuid import uuid4
 
 from core.ai import AI
 from utils.helpers import ensure_directories_exist
-from config import IMAGES_PATH, get_image_url
+from config import IMAGE_API_URL, IMAGE_CONCURRENCY, IMAGES_PATH, STABILITY_API_KEY, get_image_url
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Prompt prefixes for each art style, keyed by lowercase style name
+_STYLE_PREFIXES = {
+    "manga": "Manga style, black and white, detailed linework, ",
+    "webtoon": "Webtoon style, vibrant colors, clean linework, ",
+    "comic": "Comic book style, strong outlines, flat colors, ",
+}
+
+# Base URL of generated images, built once instead of per image
+IMAGES_URL = get_image_url(IMAGES_PATH)
+
+# Placeholder images used when generation is unavailable or fails
+PLACEHOLDER_PATH = "static/images/placeholder.jpg"
+DEFAULT_PLACEHOLDER_PATH = "static/images/default_placeholder.jpg"
+
+# Placeholder path found on disk, resolved by prepare_placeholder_image
+_placeholder_path: Optional[str] = None
+
+# Size of the chunks image responses are streamed to disk in
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+# Bounds image API requests in flight for the whole process, not per task, to respect the API rate limits
+_image_slots = asyncio.Semaphore(IMAGE_CONCURRENCY)
+
+# Image API session shared by every ImageService, so connections are kept alive across panels and tasks
+_session: Optional[aiohttp.ClientSession] = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """
+    Get the shared image API session, creating it on first use
+    
+    Returns:
+        The shared aiohttp session
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=180),
+        )
+    return _session
+
+async def close_image_session() -> None:
+    """Close the shared image API session and its connections"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
 class ImageService:
     """
     Service for generating panel images using AI image generation
@@ -29,12 +79,9 @@ class ImageService:
             ai: AI interface for generation tasks
         """
         self.ai = ai
-        # Try to get API key from multiple possible environment variable names
-        self.api_key = os.getenv("STABILITY_API_KEY") or os.getenv("STABLE_DIFFUSION_API_KEY")
-        self.image_api_url = os.getenv(
-            "IMAGE_API_URL", 
-            "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
-        )
+        # Settings are read from the environment once, in config
+        self.api_key = STABILITY_API_KEY
+        self.image_api_url = IMAGE_API_URL
         
         # Log API key status
         if self.api_key:
@@ -69,6 +116,11 @@ class ImageService:
         """
         logger.info(f"Generating image for panel: {filename_prefix}")
         
+        # Without an API key the image would be a placeholder anyway, so skip the prompt generation call
+        if not self.api_key:
+            logger.warning("No Stability API key found, using placeholder image")
+            return await self._generate_placeholder_image(filename_prefix)
+        
         try:
             # Generate a detailed prompt for the image generator
             image_prompt = await self.ai.generate_image_prompt(
@@ -86,9 +138,8 @@ class ImageService:
         
         except Exception as e:
             logger.error(f"Error generating image: {str(e)}")
-            # Return a placeholder image path
-            placeholder_path = await self._generate_placeholder_image(filename_prefix)
-            return placeholder_path
+            # Return the placeholder image path and URL
+            return await self._generate_placeholder_image(filename_prefix)
     
     async def _call_image_api(
         self, 
@@ -108,15 +159,7 @@ class ImageService:
             Tuple containing (file_system_path, accessible_url) for the generated image
         """
         # Modify prompt based on style
-        style_prefix = ""
-        if style.lower() == "manga":
-            style_prefix = "Manga style, black and white, detailed linework, "
-        elif style.lower() == "webtoon":
-            style_prefix = "Webtoon style, vibrant colors, clean linework, "
-        elif style.lower() == "comic":
-            style_prefix = "Comic book style, strong outlines, flat colors, "
-        
-        full_prompt = style_prefix + prompt
+        full_prompt = _STYLE_PREFIXES.get(style.lower(), "") + prompt
         logger.debug(f"Full image prompt: {full_prompt[:100]}...")
         
         # Check if we have the API key for Stability AI
@@ -131,7 +174,8 @@ class ImageService:
         try:
             headers = {
                 "Content-Type": "application/json",
-                "Accept": "application/json",
+                # Raw PNG bytes are streamed to disk instead of decoding a base64 JSON payload
+                "Accept": "image/png",
                 "Authorization": f"Bearer {self.api_key}"
             }
             
@@ -156,38 +200,39 @@ class ImageService:
             
             logger.debug("Calling Stability AI API")
             
-            async with aiohttp.ClientSession() as session:
+            session = _get_session()
+            async with _image_slots:
                 async with session.post(
                     self.image_api_url, 
-                    json=payload, 
+                    data=orjson.dumps(payload), 
                     headers=headers
                 ) as response:
                     if response.status == 200:
-                        response_data = await response.json()
+                        # A random suffix keeps images generated in the same second from overwriting each other
+                        image_filename = f"{filename_prefix}_{uuid4().hex[:12]}.png"
+                        image_path = f"{IMAGES_PATH}/{image_filename}"
                         
-                        # Process the generated image
-                        if "artifacts" in response_data and len(response_data["artifacts"]) > 0:
-                            # Get the first generated image
-                            image_data = response_data["artifacts"][0]["base64"]
-                            
-                            # Save the image to disk
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            image_filename = f"{filename_prefix}_{timestamp}.png"
-                            image_path = f"{IMAGES_PATH}/{image_filename}"
+                        if response.content_type == "image/png":
+                            # Write the image as it arrives, only one chunk is held in memory
+                            async with aiofiles.open(image_path, "wb") as f:
+                                async for chunk in response.content.iter_chunked(IMAGE_CHUNK_SIZE):
+                                    await f.write(chunk)
+                        else:
+                            # Endpoints that only answer with JSON return the image base64 encoded
+                            response_data = orjson.loads(await response.read())
+                            if not response_data.get("artifacts"):
+                                logger.error("No image artifacts returned from API")
+                                return await self._generate_placeholder_image(filename_prefix)
                             
-                            # Decode and save image
-                            image_bytes = base64.b64decode(image_data)
+                            image_bytes = pybase64.b64decode(response_data["artifacts"][0]["base64"])
                             async with aiofiles.open(image_path, "wb") as f:
                                 await f.write(image_bytes)
-                            
-                            # Generate accessible URL
-                            image_url = get_image_url(image_path)
-                            
-                            logger.info(f"Image saved to {image_path} (URL: {image_url})")
-                            return image_path, image_url
-                        else:
-                            logger.error("No image artifacts returned from API")
-                            return await self._generate_placeholder_image(filename_prefix)
+                        
+                        # Generate accessible URL
+                        image_url = f"{IMAGES_URL}/{image_filename}"
+                        
+                        logger.info(f"Image saved to {image_path} (URL: {image_url})")
+                        return image_path, image_url
                     else:
                         error_text = await response.text()
                         logger.error(f"API error ({response.status}): {error_text}")
@@ -207,56 +252,71 @@ class ImageService:
         Returns:
             Tuple containing (file_system_path, accessible_url) for the placeholder image
         """
-        # Check if placeholder already exists
-        default_placeholder_path = "static/images/default_placeholder.jpg"
-        placeholder_path = "static/images/placeholder.jpg"
-        
-        # If neither placeholder exists, create a very simple one
-        if not os.path.exists(placeholder_path) and not os.path.exists(default_placeholder_path):
-            from PIL import Image, ImageDraw, ImageFont
-            
-            logger.info("Creating default placeholder image")
-            
-            # Create a simple placeholder image
-            width, height = 768, 1024
-            image = Image.new("RGB", (width, height), color=(240, 240, 240))
-            draw = ImageDraw.Draw(image)
-            
-            # Add placeholder text
-            try:
-                # Try to load a font
-                font = ImageFont.load_default()
-                draw.text(
-                    (width//2, height//2), 
-                    "Placeholder Image", 
-                    fill=(0, 0, 0), 
-                    font=font, 
-                    anchor="mm"
-                )
-            except Exception:
-                # If font loading fails, draw a rectangle
-                draw.rectangle(
-                    [(width//4, height//4), (width*3//4, height*3//4)], 
-                    outline=(0, 0, 0)
-                )
-            
-            # Save the image
-            os.makedirs("static/images", exist_ok=True)
-            image.save(placeholder_path, "JPEG")
-            logger.info(f"Created placeholder image at {placeholder_path}")
+        # Normally already resolved at startup
+        await prepare_placeholder_image()
         
-        # Use existing placeholder
-        if os.path.exists(placeholder_path):
-            path_to_return = placeholder_path
-        elif os.path.exists(default_placeholder_path):
-            path_to_return = default_placeholder_path
-        else:
+        path_to_return = _placeholder_path
+        if path_to_return is None:
             # If all else fails, return the path even if the file doesn't exist
             logger.warning("No placeholder image found, returning path anyway")
-            path_to_return = placeholder_path
+            path_to_return = PLACEHOLDER_PATH
         
         # Generate accessible URL
         url_to_return = get_image_url(path_to_return)
         logger.info(f"Using placeholder image: {path_to_return} (URL: {url_to_return})")
         
-        return path_to_return, url_to_return
\ No newline at end of file
+        return path_to_return, url_to_return
+
+async def prepare_placeholder_image() -> None:
+    """Find or create the placeholder image in a worker thread, keeping PIL and disk work off the event loop"""
+    global _placeholder_path
+    if _placeholder_path is None:
+        _placeholder_path = await asyncio.to_thread(_find_or_create_placeholder)
+
+def _find_or_create_placeholder() -> Optional[str]:
+    """
+    Find the placeholder image on disk, creating a simple one if none exists
+    
+    Returns:
+        Path of the placeholder image, or None if it could not be found
+    """
+    # If neither placeholder exists, create a very simple one
+    if not os.path.exists(PLACEHOLDER_PATH) and not os.path.exists(DEFAULT_PLACEHOLDER_PATH):
+        from PIL import Image, ImageDraw, ImageFont
+        
+        logger.info("Creating default placeholder image")
+        
+        # Create a simple placeholder image
+        width, height = 768, 1024
+        image = Image.new("RGB", (width, height), color=(240, 240, 240))
+        draw = ImageDraw.Draw(image)
+        
+        # Add placeholder text
+        try:
+            # Try to load a font
+            font = ImageFont.load_default()
+            draw.text(
+                (width//2, height//2), 
+                "Placeholder Image", 
+                fill=(0, 0, 0), 
+                font=font, 
+                anchor="mm"
+            )
+        except Exception:
+            # If font loading fails, draw a rectangle
+            draw.rectangle(
+                [(width//4, height//4), (width*3//4, height*3//4)], 
+                outline=(0, 0, 0)
+            )
+        
+        # Save the image
+        os.makedirs("static/images", exist_ok=True)
+        image.save(PLACEHOLDER_PATH, "JPEG")
+        logger.info(f"Created placeholder image at {PLACEHOLDER_PATH}")
+    
+    # Use existing placeholder
+    if os.path.exists(PLACEHOLDER_PATH):
+        return PLACEHOLDER_PATH
+    if os.path.exists(DEFAULT_PLACEHOLDER_PATH):
+        return DEFAULT_PLACEHOLDER_PATH
+    return None
@@ -4,6 +4,9 @@ Layout service module for managing panel layout and composition
 from typing import Dict, Any, List
 from models.panel import Panel
 
+# Default positions of the first bubbles in a panel, later bubbles use the last one
+_BUBBLE_POSITIONS = ("top-right", "top-left", "bottom-right", "bottom-left")
+
 class LayoutService:
     """
     Service for managing panel layout and composition
@@ -13,7 +16,7 @@ class LayoutService:
         """Initialize the layout service"""
         pass
     
-    async def apply_layout(self, panel: Panel) -> Panel:
+    def apply_layout(self, panel: Panel) -> Panel:
         """
         Apply layout rules to a panel
         
@@ -28,12 +31,12 @@ class LayoutService:
             panel.size = "full"
         
         # Position speech bubbles if needed
-        if panel.speech_bubbles and not all(hasattr(bubble, 'position') for bubble in panel.speech_bubbles):
-            await self._position_speech_bubbles(panel)
+        if panel.speech_bubbles and any(not getattr(bubble, 'position', None) for bubble in panel.speech_bubbles):
+            self._position_speech_bubbles(panel)
         
         return panel
     
-    async def _position_speech_bubbles(self, panel: Panel) -> None:
+    def _position_speech_bubbles(self, panel: Panel) -> None:
         """
         Position speech bubbles within a panel
         
@@ -42,18 +45,11 @@ class LayoutService:
         """
         # Simple automatic positioning - in a real implementation, this would be more sophisticated
         for i, bubble in enumerate(panel.speech_bubbles):
-            if not hasattr(bubble, 'position') or not bubble.position:
+            if not getattr(bubble, 'position', None):
                 # Simple positioning strategy - distribute evenly
-                if i == 0:
-                    bubble.position = "top-right"
-                elif i == 1:
-                    bubble.position = "top-left"
-                elif i == 2:
-                    bubble.position = "bottom-right"
-                else:
-                    bubble.position = "bottom-left"
+                bubble.position = _BUBBLE_POSITIONS[min(i, 3)]
     
-    async def optimize_panel_flow(self, panels: List[Panel]) -> List[Panel]:
+    def optimize_panel_flow(self, panels: List[Panel]) -> List[Panel]:
         """
         Optimize the flow of panels in a manga/webtoon
         
@@ -67,7 +63,7 @@ class LayoutService:
         # In a real implementation, this could reorder panels or adjust their sizes
         return panels
     
-    async def generate_layout_suggestions(self, panel: Panel) -> Dict[str, Any]:
+    def generate_layout_suggestions(self, panel: Panel) -> Dict[str, Any]:
         """
         Generate layout suggestions for a panel
         
@@ -81,15 +77,12 @@ class LayoutService:
         # and generate appropriate layout suggestions
         suggestions = {
             "size": panel.size,
-            "speech_bubble_positions": [],
+            # Add speech bubble position suggestions
+            "speech_bubble_positions": [
+                {"character": bubble.character, "position": getattr(bubble, 'position', "top-left")}
+                for bubble in panel.speech_bubbles
+            ],
             "visual_emphasis": "medium"
         }
         
-        # Add speech bubble position suggestions
-        for bubble in panel.speech_bubbles:
-            suggestions["speech_bubble_positions"].append({
-                "character": bubble.character,
-                "position": bubble.position if hasattr(bubble, 'position') else "top-left"
-            })
-        
         return suggestions
\ No newline at end of file
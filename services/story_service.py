@@ -1,17 +1,93 @@
 """
 Story service module for generating manga/webtoon stories and panel content
 """
-import uuid
+import asyncio
+import hashlib
+import os
+import re
 import logging
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional
+
+import orjson
 
 from core.ai import AI
 from models.panel import Panel
 from models.speech_bubble import SpeechBubble
+from utils.store import Store
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Panels generated for a story outline and panel count, shared by every StoryService
+_panels_cache = Store(maxsize=128)
+
+# Common panel size names returned by the model, mapped to valid sizes
+_SIZE_MAP = {
+    "full-width": "full",
+    "full_width": "full",
+    "fullwidth": "full",
+    "half-width": "half",
+    "half_width": "half",
+    "halfwidth": "half",
+    "third-width": "third",
+    "third_width": "third",
+    "thirdwidth": "third",
+    "quarter-width": "quarter",
+    "quarter_width": "quarter",
+    "quarterwidth": "quarter"
+}
+_VALID_SIZES = frozenset({"full", "half", "third", "quarter"})
+
+# Common position terms mapped to the axis and valid value they set
+_POSITION_TOKENS = {
+    "left": ("horiz", "left"),
+    "center": ("horiz", "center"),
+    "middle": ("horiz", "center"),
+    "right": ("horiz", "right"),
+    "top": ("vert", "top"),
+    "upper": ("vert", "top"),
+    "bottom": ("vert", "bottom"),
+    "lower": ("vert", "bottom")
+}
+# Whole terms only, "-" and "_" separate them like other non-alphanumerics (\b would not split on "_")
+_POSITION_RE = re.compile(rf"(?<![a-z0-9])(?:{'|'.join(_POSITION_TOKENS)})(?![a-z0-9])")
+
+# Canonical values that normalization would return unchanged
+_VALID_POSITIONS = frozenset(f"{vert}-{horiz}" for vert in ("top", "bottom") for horiz in ("left", "center", "right"))
+_VALID_TAILS = frozenset({"top", "right", "bottom", "left", "none"})
+_VALID_STYLES = frozenset({"normal", "thought", "shout", "whisper"})
+
+# Common tail direction terms mapped to valid values
+_DIRECTION_MAP = {
+    "up": "top",
+    "upward": "top",
+    "upwards": "top",
+    "down": "bottom",
+    "downward": "bottom",
+    "downwards": "bottom",
+    "left": "left",
+    "leftward": "left",
+    "right": "right",
+    "rightward": "right",
+    "none": "none"
+}
+
+# Common bubble style terms mapped to valid values
+_STYLE_MAP = {
+    "normal": "normal",
+    "regular": "normal",
+    "thought": "thought",
+    "thinking": "thought",
+    "shout": "shout",
+    "shouted": "shout",
+    "shouting": "shout",
+    "yell": "shout",
+    "yelling": "shout",
+    "whisper": "whisper",
+    "whispering": "whisper",
+    "quiet": "whisper"
+}
+
 class StoryService:
     """
     Service for generating story elements and panel content
@@ -49,8 +125,8 @@ class StoryService:
                 if "theme" in story:
                     story["title"] = story["theme"].title()
                 else:
-                    # Get first 5 words of prompt as title
-                    title_words = prompt.split()[:5]
+                    # Get first 5 words of prompt as title, without splitting the rest of the prompt
+                    title_words = prompt.split(maxsplit=5)[:5]
                     story["title"] = " ".join(title_words).title()
             
             logger.info(f"Story generated with title: {story.get('title', 'Untitled')}")
@@ -71,192 +147,71 @@ class StoryService:
         Returns:
             List of Panel objects
         """
+        return [panel async for panel in self.stream_panels(story, num_panels)]
+    
+    async def stream_panels(self, story: Dict[str, Any], num_panels: int) -> AsyncIterator[Panel]:
+        """
+        Generate panels from a story outline, yielding each one as soon as its description arrives
+        
+        Speech bubbles are placed for all panels in one request after the last description,
+        so yielded panels only get their speech bubbles once the iterator is exhausted.
+        
+        Args:
+            story: Story outline dictionary
+            num_panels: Number of panels to generate
+            
+        Yields:
+            Panel objects, in order
+        """
         logger.info(f"Generating {num_panels} panels")
         
+        # Speech bubbles are sampled at a non-zero temperature, so panels are only reused when every response is cached
+        cache_key = None
+        if self.ai.cache is not None and self.ai.cache_all:
+            cache_key = hashlib.blake2b(
+                orjson.dumps(story, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+                + f"|{num_panels}".encode()
+            ).hexdigest()
+            cached_panels = _panels_cache.get(cache_key)
+            if cached_panels is not None:
+                logger.info(f"Using cached panels for {cache_key}")
+                for panel in self._copy_panels(cached_panels):
+                    yield panel
+                return
+        
         try:
-            # Generate panel descriptions using AI
-            panel_descriptions = await self.ai.generate_panel_descriptions(story, num_panels)
+            # Draw random bytes for the requested panel IDs at once, 16 bytes per panel like a UUID
+            id_bytes = os.urandom(16 * num_panels)
             
             panels = []
-            for i, panel_desc in enumerate(panel_descriptions):
-                # Create a unique ID for the panel
-                panel_id = str(uuid.uuid4())
+            # Every description was validated by PanelDescription, so its fields are read as-is
+            async for panel_desc in self.ai.generate_panel_descriptions_stream(story, num_panels):
+                i = len(panels)
+                # Create a unique ID for the panel, the model may return more panels than requested
+                panel_id = id_bytes[i * 16:(i + 1) * 16].hex() if i < num_panels else os.urandom(16).hex()
                 
                 # Extract panel information
-                description = panel_desc.get("visual_description", "")
-                characters = panel_desc.get("characters", [])
-                
-                # Process dialogue
-                dialogue = panel_desc.get("dialogue", [])
-                speech_bubbles = []
-                
-                # If dialogue is provided, create speech bubbles
-                if dialogue:
-                    # If dialogue is a list of strings, convert to dict format
-                    if isinstance(dialogue, list) and dialogue and isinstance(dialogue[0], str):
-                        dialogue = [{"character": "Character", "text": text} for text in dialogue]
-                    
-                    # If dialogue is a dict with character keys, convert to list
-                    if isinstance(dialogue, dict):
-                        dialogue = [{"character": char, "text": text} for char, text in dialogue.items()]
-                    
-                    # Generate speech bubbles from dialogue
-                    if dialogue:
-                        try:
-                            speech_bubbles_data = await self.ai.generate_speech_bubbles(description, dialogue)
-                            
-                            # Create SpeechBubble objects
-                            for bubble_data in speech_bubbles_data:
-                                # Normalize position format
-                                position = bubble_data.get("position", "top-left")
-                                
-                                # Map position to valid format (horizontal-vertical)
-                                if position and isinstance(position, str):
-                                    # Extract horizontal and vertical components
-                                    parts = position.lower().replace('_', '-').split('-')
-                                    
-                                    # Map common position terms to valid values
-                                    horiz_map = {
-                                        "left": "left", 
-                                        "center": "center", 
-                                        "middle": "center", 
-                                        "right": "right"
-                                    }
-                                    vert_map = {
-                                        "top": "top", 
-                                        "upper": "top", 
-                                        "middle": "center", 
-                                        "center": "center", 
-                                        "bottom": "bottom", 
-                                        "lower": "bottom"
-                                    }
-                                    
-                                    # Default positions
-                                    horiz = "left"
-                                    vert = "top"
-                                    
-                                    # Parse position parts
-                                    for part in parts:
-                                        if part in horiz_map:
-                                            horiz = horiz_map[part]
-                                        elif part in vert_map:
-                                            vert = vert_map[part]
-                                    
-                                    # Format as "vertical-horizontal"
-                                    position = f"{vert}-{horiz}"
-                                
-                                # Normalize tail direction
-                                tail_direction = bubble_data.get("tail_direction", "bottom")
-                                if tail_direction and isinstance(tail_direction, str):
-                                    # Map common tail direction terms to valid values
-                                    direction_map = {
-                                        "up": "top",
-                                        "upward": "top",
-                                        "upwards": "top",
-                                        "down": "bottom",
-                                        "downward": "bottom",
-                                        "downwards": "bottom",
-                                        "left": "left",
-                                        "leftward": "left",
-                                        "right": "right",
-                                        "rightward": "right",
-                                        "none": "none"
-                                    }
-                                    
-                                    # Check for exact matches
-                                    if tail_direction.lower() in direction_map:
-                                        tail_direction = direction_map[tail_direction.lower()]
-                                    # Check for phrases like "pointing to Character"
-                                    elif "pointing" in tail_direction.lower():
-                                        tail_direction = "bottom"  # Default when pointing to a character
-                                    else:
-                                        # Default to bottom if not recognized
-                                        tail_direction = "bottom"
-                                
-                                # Normalize style
-                                style = bubble_data.get("style", "normal")
-                                if style and isinstance(style, str):
-                                    # Map common style terms to valid values
-                                    style_map = {
-                                        "normal": "normal",
-                                        "regular": "normal",
-                                        "thought": "thought",
-                                        "thinking": "thought",
-                                        "shout": "shout", 
-                                        "shouted": "shout",
-                                        "shouting": "shout",
-                                        "yell": "shout",
-                                        "yelling": "shout",
-                                        "whisper": "whisper",
-                                        "whispering": "whisper",
-                                        "quiet": "whisper"
-                                    }
-                                    
-                                    if style.lower() in style_map:
-                                        style = style_map[style.lower()]
-                                    else:
-                                        # Default to normal if not recognized
-                                        style = "normal"
-                                
-                                # Create the speech bubble with normalized values
-                                speech_bubbles.append(SpeechBubble(
-                                    text=bubble_data.get("text", ""),
-                                    character=bubble_data.get("character", "Unknown"),
-                                    position=position,
-                                    style=style,
-                                    tail_direction=tail_direction
-                                ))
-                        except Exception as bubble_error:
-                            logger.error(f"Error generating speech bubbles: {str(bubble_error)}")
-                            # Create basic speech bubbles if AI generation fails
-                            for j, d in enumerate(dialogue):
-                                speech_bubbles.append(SpeechBubble(
-                                    text=d.get("text", ""),
-                                    character=d.get("character", "Character"),
-                                    position=f"{'top' if j % 2 == 0 else 'bottom'}-{'left' if j % 2 == 0 else 'right'}",
-                                    style="normal",
-                                    tail_direction="bottom"
-                                ))
+                description = panel_desc["visual_description"]
                 
                 # Convert panel size to valid format
-                panel_size = panel_desc.get("panel_size", "full")
+                panel_size = panel_desc["panel_size"]
                 # Map common size names to valid sizes
-                size_mapping = {
-                    "full-width": "full",
-                    "full_width": "full",
-                    "fullwidth": "full",
-                    "half-width": "half",
-                    "half_width": "half",
-                    "halfwidth": "half",
-                    "third-width": "third",
-                    "third_width": "third",
-                    "thirdwidth": "third",
-                    "quarter-width": "quarter",
-                    "quarter_width": "quarter",
-                    "quarterwidth": "quarter"
-                }
-                if panel_size in size_mapping:
-                    panel_size = size_mapping[panel_size]
-                elif panel_size not in ["full", "half", "third", "quarter"]:
+                if panel_size in _SIZE_MAP:
+                    panel_size = _SIZE_MAP[panel_size]
+                elif panel_size not in _VALID_SIZES:
                     panel_size = "full"  # Default to full if invalid size
                 
-                # Convert special effects to proper format
-                special_effects = panel_desc.get("special_effects", [])
-                formatted_effects = []
-                for effect in special_effects:
-                    if isinstance(effect, str):
-                        # Convert string to dictionary format
-                        formatted_effects.append({"description": effect})
-                    elif isinstance(effect, dict):
-                        formatted_effects.append(effect)
+                # Convert special effects to proper format, the schema allows only strings or null
+                formatted_effects = [{"description": effect} for effect in panel_desc["special_effects"] or []]
                 
-                # Create the panel object
-                panel = Panel(
+                # Create the panel object, every field was validated by PanelDescription and normalized above.
+                # model_construct runs no validators, image_path is set later and normalized by HTMLRenderer
+                panel = Panel.model_construct(
                     panel_id=panel_id,
                     description=description,
-                    characters=characters,
-                    dialogue=dialogue,
-                    speech_bubbles=speech_bubbles,
+                    characters=panel_desc["characters"],
+                    dialogue=panel_desc["dialogue"],
+                    speech_bubbles=[],
                     size=panel_size,
                     caption=panel_desc.get("caption", None),
                     effects=formatted_effects
@@ -264,14 +219,176 @@ class StoryService:
                 
                 panels.append(panel)
                 logger.debug(f"Created panel {panel_id}: {description[:50]}...")
+                yield panel
+            
+            # Place every panel's speech bubbles in one request
+            speech_bubbles_per_panel = await self._create_speech_bubbles_batch(
+                [panel.description for panel in panels],
+                [panel.dialogue for panel in panels]
+            )
+            for panel, speech_bubbles in zip(panels, speech_bubbles_per_panel):
+                panel.speech_bubbles = speech_bubbles
             
             logger.info(f"Generated {len(panels)} panels successfully")
-            return panels
+            if cache_key is not None:
+                # Callers set image paths on the yielded panels, so the cache keeps its own copies
+                _panels_cache.set(cache_key, [panel.model_copy(deep=True) for panel in panels])
             
         except Exception as e:
             logger.error(f"Error generating panels: {str(e)}")
             raise
     
+    @staticmethod
+    def _copy_panels(panels: List[Panel]) -> List[Panel]:
+        """
+        Copy cached panels with fresh panel IDs
+        
+        Args:
+            panels: Cached panels
+            
+        Returns:
+            Deep copies of the panels, each with a new unique ID
+        """
+        id_bytes = os.urandom(16 * len(panels))
+        return [
+            panel.model_copy(deep=True, update={"panel_id": id_bytes[i * 16:(i + 1) * 16].hex()})
+            for i, panel in enumerate(panels)
+        ]
+    
+    async def _create_speech_bubbles_batch(
+        self,
+        descriptions: List[str],
+        dialogues: List[Any]
+    ) -> List[List[SpeechBubble]]:
+        """
+        Generate speech bubbles for several panels with a single AI request
+        
+        Panels missing from the batched response, or all panels if the batched
+        request fails, fall back to one request per panel.
+        
+        Args:
+            descriptions: Visual description of each panel
+            dialogues: Dialogue of each panel
+            
+        Returns:
+            List of SpeechBubble objects for each panel
+        """
+        indices = [i for i, dialogue in enumerate(dialogues) if dialogue]
+        batch: List[Optional[List[Dict[str, Any]]]] = [None] * len(indices)
+        
+        # A single panel gains nothing from batching, it goes through the per-panel request
+        if len(indices) > 1:
+            try:
+                batch = await self.ai.generate_speech_bubbles_batch(
+                    [(descriptions[i], dialogues[i]) for i in indices]
+                )
+            except Exception as batch_error:
+                logger.warning(f"Batched speech bubbles failed, falling back to per-panel requests: {str(batch_error)}")
+        
+        speech_bubbles_per_panel: List[List[SpeechBubble]] = [[] for _ in dialogues]
+        results = await asyncio.gather(*[
+            self._create_speech_bubbles(descriptions[i], dialogues[i], speech_bubbles_data)
+            for i, speech_bubbles_data in zip(indices, batch)
+        ])
+        for i, speech_bubbles in zip(indices, results):
+            speech_bubbles_per_panel[i] = speech_bubbles
+        return speech_bubbles_per_panel
+    
+    async def _create_speech_bubbles(
+        self,
+        description: str,
+        dialogue: Any,
+        speech_bubbles_data: Optional[List[Dict[str, Any]]] = None
+    ) -> List[SpeechBubble]:
+        """
+        Generate speech bubbles for a panel's dialogue
+        
+        Args:
+            description: Visual description of the panel
+            dialogue: Dialogue of the panel
+            speech_bubbles_data: Optional bubble placements already generated, e.g. by a batched request
+            
+        Returns:
+            List of SpeechBubble objects, empty when the panel has no dialogue
+        """
+        speech_bubbles = []
+        
+        # Generate speech bubbles from dialogue
+        if dialogue:
+            try:
+                if speech_bubbles_data is None:
+                    speech_bubbles_data = await self.ai.generate_speech_bubbles(description, dialogue)
+                
+                # Create SpeechBubble objects
+                for bubble_data in speech_bubbles_data:
+                    # Normalize position format
+                    position = bubble_data.get("position", "top-left")
+                    
+                    # Map position to valid format (horizontal-vertical)
+                    if position and isinstance(position, str) and position not in _VALID_POSITIONS:
+                        # Default positions
+                        axes = {"horiz": "left", "vert": "top"}
+                        
+                        # Extract horizontal and vertical components
+                        for token in _POSITION_RE.findall(position.lower()):
+                            axis, value = _POSITION_TOKENS[token]
+                            axes[axis] = value
+                        
+                        # Format as "vertical-horizontal"
+                        position = f"{axes['vert']}-{axes['horiz']}"
+                    
+                    # Normalize tail direction
+                    tail_direction = bubble_data.get("tail_direction", "bottom")
+                    if tail_direction and isinstance(tail_direction, str) and tail_direction not in _VALID_TAILS:
+                        # Check for exact matches
+                        if tail_direction.lower() in _DIRECTION_MAP:
+                            tail_direction = _DIRECTION_MAP[tail_direction.lower()]
+                        # Check for phrases like "pointing to Character"
+                        elif "pointing" in tail_direction.lower():
+                            tail_direction = "bottom"  # Default when pointing to a character
+                        else:
+                            # Default to bottom if not recognized
+                            tail_direction = "bottom"
+                    
+                    # Normalize style
+                    style = bubble_data.get("style", "normal")
+                    if style and isinstance(style, str) and style not in _VALID_STYLES:
+                        if style.lower() in _STYLE_MAP:
+                            style = _STYLE_MAP[style.lower()]
+                        else:
+                            # Default to normal if not recognized
+                            style = "normal"
+                    
+                    # Create the speech bubble with normalized values
+                    bubble_fields = {
+                        "text": bubble_data.get("text", ""),
+                        "character": bubble_data.get("character", "Unknown"),
+                        "position": position,
+                        "style": style,
+                        "tail_direction": tail_direction
+                    }
+                    if (
+                        isinstance(position, str) and position in _VALID_POSITIONS
+                        and tail_direction in _VALID_TAILS and style in _VALID_STYLES
+                    ):
+                        # Every field is canonical after normalization and text comes from a validated response
+                        speech_bubbles.append(SpeechBubble.model_construct(**bubble_fields))
+                    else:
+                        speech_bubbles.append(SpeechBubble(**bubble_fields))
+            except Exception as bubble_error:
+                logger.error(f"Error generating speech bubbles: {str(bubble_error)}")
+                # Create basic speech bubbles if AI generation fails
+                for j, d in enumerate(dialogue):
+                    speech_bubbles.append(SpeechBubble(
+                        text=d.get("text", ""),
+                        character=d.get("character", "Character"),
+                        position=f"{'top' if j % 2 == 0 else 'bottom'}-{'left' if j % 2 == 0 else 'right'}",
+                        style="normal",
+                        tail_direction="bottom"
+                    ))
+    
+        return speech_bubbles
+    
     async def generate_dialogue(self, panel_description: str, characters: List[str]) -> List[Dict[str, str]]:
         """
         Generate dialogue for characters in a panel
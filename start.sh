@@ -20,4 +20,4 @@ mkdir -p server/static/temp
 
 # Start the FastAPI server
 echo "Starting SketchDojo Server..."
-uvicorn main:app --reload --host 0.0.0.0 --port 8000
\ No newline at end of file
+uvicorn main:app --reload --host 0.0.0.0 --port 8000 --loop uvloop --http httptools
\ No newline at end of file
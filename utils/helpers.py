@@ -1,21 +1,30 @@
 """
 Helper utilities for SketchDojo Server
 """
+import asyncio
+import atexit
 import os
-import json
+import functools
+import mmap
+import queue
+import re
+import time
 import logging
-import base64
-import aiofiles
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+import pybase64
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
-from datetime import datetime
+from typing import Dict, Iterator, List, Any, Optional, Union
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=1)
 def ensure_directories_exist():
     """
     Ensure all required directories exist
+    
+    The directories are only created on the first call, later calls return immediately.
     """
     directories = [
         "static/images",
@@ -28,6 +37,17 @@ def ensure_directories_exist():
         os.makedirs(directory, exist_ok=True)
         logger.debug(f"Ensured directory exists: {directory}")
 
+@functools.lru_cache(maxsize=256)
+def _ensure_directory(directory: str) -> None:
+    """
+    Create a directory if needed, each directory is only checked once per process
+    
+    Args:
+        directory: Directory to create, the current directory when empty
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
 def generate_timestamp():
     """
     Generate a timestamp string for filenames
@@ -35,7 +55,16 @@ def generate_timestamp():
     Returns:
         str: Timestamp string in format YYYYMMDD_HHMMSS
     """
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
+    return time.strftime("%Y%m%d_%H%M%S")
+
+def _dump_json_to_file(data: Any, filename: str) -> None:
+    """Serialize data with orjson and write it to a file, creating its directory if needed"""
+    _ensure_directory(os.path.dirname(filename))
+    Path(filename).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+
+def _load_json_from_file(filename: str) -> Any:
+    """Read a file and parse it with orjson"""
+    return orjson.loads(Path(filename).read_bytes())
 
 def save_data_to_json(data: Any, filename: str):
     """
@@ -46,11 +75,8 @@ def save_data_to_json(data: Any, filename: str):
         filename: Filename to save to
     """
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Serializing before opening the file leaves no partial file behind on errors
+        _dump_json_to_file(data, filename)
         logger.info(f"Data saved to {filename}")
     except Exception as e:
         logger.error(f"Error saving data to {filename}: {str(e)}")
@@ -64,12 +90,8 @@ async def save_data_to_json_async(data: Any, filename: str):
         filename: Filename to save to
     """
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        json_str = json.dumps(data, indent=2, ensure_ascii=False)
-        async with aiofiles.open(filename, 'w', encoding='utf-8') as f:
-            await f.write(json_str)
+        # Serialize and write in one worker thread hop, so large payloads do not block the event loop
+        await asyncio.to_thread(_dump_json_to_file, data, filename)
         logger.info(f"Data saved to {filename}")
     except Exception as e:
         logger.error(f"Error saving data to {filename}: {str(e)}")
@@ -85,8 +107,7 @@ def load_data_from_json(filename: str) -> Dict[str, Any]:
         Dictionary with loaded data
     """
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = _load_json_from_file(filename)
         logger.info(f"Data loaded from {filename}")
         return data
     except Exception as e:
@@ -104,9 +125,7 @@ async def load_data_from_json_async(filename: str) -> Dict[str, Any]:
         Dictionary with loaded data
     """
     try:
-        async with aiofiles.open(filename, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        data = json.loads(content)
+        data = await asyncio.to_thread(_load_json_from_file, filename)
         logger.info(f"Data loaded from {filename}")
         return data
     except Exception as e:
@@ -118,14 +137,21 @@ def encode_image_to_base64(image_path: str) -> str:
     Encode an image to base64
     
     Args:
-        image_path: Path to the image
+        image_path: Path to the image, or a base64 data URL
         
     Returns:
         Base64 encoded string
     """
+    # Base64 data URLs already hold the encoded image
+    if image_path.startswith("data:"):
+        header, separator, payload = image_path.partition(",")
+        if separator and header.endswith(";base64"):
+            return payload
+    
     try:
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
+        # Encode straight from the page cache instead of copying the file into a bytes object first
+        with open(image_path, "rb") as image_file, mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image_data:
+            encoded_string = pybase64.b64encode_as_string(image_data)
         return encoded_string
     except Exception as e:
         logger.error(f"Error encoding image to base64: {str(e)}")
@@ -136,19 +162,45 @@ async def encode_image_to_base64_async(image_path: str) -> str:
     Encode an image to base64 asynchronously
     
     Args:
-        image_path: Path to the image
+        image_path: Path to the image, or a base64 data URL
         
     Returns:
         Base64 encoded string
     """
-    try:
-        async with aiofiles.open(image_path, "rb") as image_file:
-            image_data = await image_file.read()
-        encoded_string = base64.b64encode(image_data).decode("utf-8")
-        return encoded_string
-    except Exception as e:
-        logger.error(f"Error encoding image to base64: {str(e)}")
-        return ""
+    # Data URLs need no file I/O
+    if image_path.startswith("data:"):
+        return encode_image_to_base64(image_path)
+    
+    # Read and encode in one worker thread hop, so large images do not block the event loop
+    return await asyncio.to_thread(encode_image_to_base64, image_path)
+
+# Base64 characters decoded per chunk, a multiple of 4 so every chunk decodes on its own
+BASE64_CHUNK_CHARS = 256 * 1024
+
+# Line breaks and other whitespace the base64 decoder would skip, removed before chunking
+_BASE64_WHITESPACE_RE = re.compile(r"\s")
+
+def _iter_base64_chunks(base64_string: str) -> Iterator[bytes]:
+    """
+    Decode base64 in chunks, so the decoded image never has to be held in memory at once
+    
+    Args:
+        base64_string: Base64 encoded data without a data URL prefix
+        
+    Returns:
+        Iterator over the decoded bytes, chunk by chunk
+    """
+    # Drop line wraps first, so chunk boundaries are counted on base64 characters only
+    if _BASE64_WHITESPACE_RE.search(base64_string):
+        base64_string = _BASE64_WHITESPACE_RE.sub("", base64_string)
+    
+    # Unpadded input does not split on 4-character boundaries, decode it in one go
+    if len(base64_string) % 4:
+        return iter((pybase64.b64decode(base64_string),))
+    return (
+        pybase64.b64decode(base64_string[start:start + BASE64_CHUNK_CHARS])
+        for start in range(0, len(base64_string), BASE64_CHUNK_CHARS)
+    )
 
 def decode_base64_to_image(base64_string: str, output_path: str) -> bool:
     """
@@ -163,15 +215,16 @@ def decode_base64_to_image(base64_string: str, output_path: str) -> bool:
     """
     try:
         # Ensure directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        _ensure_directory(os.path.dirname(output_path))
         
-        # Remove data URL prefix if present
-        if "," in base64_string:
-            base64_string = base64_string.split(",", 1)[1]
+        # Remove data URL prefix if present, in a single scan
+        prefix, separator, payload = base64_string.partition(",")
+        if separator:
+            base64_string = payload
             
-        image_data = base64.b64decode(base64_string)
         with open(output_path, "wb") as f:
-            f.write(image_data)
+            for image_data in _iter_base64_chunks(base64_string):
+                f.write(image_data)
         logger.info(f"Image saved to {output_path}")
         return True
     except Exception as e:
@@ -189,22 +242,11 @@ async def decode_base64_to_image_async(base64_string: str, output_path: str) ->
     Returns:
         True if successful, False otherwise
     """
-    try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        # Remove data URL prefix if present
-        if "," in base64_string:
-            base64_string = base64_string.split(",", 1)[1]
-            
-        image_data = base64.b64decode(base64_string)
-        async with aiofiles.open(output_path, "wb") as f:
-            await f.write(image_data)
-        logger.info(f"Image saved to {output_path}")
-        return True
-    except Exception as e:
-        logger.error(f"Error decoding base64 to image: {str(e)}")
-        return False
+    # Decode and write every chunk in a single worker thread hop
+    return await asyncio.to_thread(decode_base64_to_image, base64_string, output_path)
+
+# Characters that are invalid in filenames, each replaced by an underscore
+_FILENAME_TRANSLATION = str.maketrans({char: '_' for char in '<>:"/\\|?*'})
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -216,10 +258,8 @@ def sanitize_filename(filename: str) -> str:
     Returns:
         Sanitized filename
     """
-    # Replace invalid characters
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
+    # Replace invalid characters in a single pass
+    filename = filename.translate(_FILENAME_TRANSLATION)
     
     # Ensure filename is not too long
     if len(filename) > 255:
@@ -228,6 +268,34 @@ def sanitize_filename(filename: str) -> str:
         
     return filename
 
+class _CachedTimeFormatter(logging.Formatter):
+    """
+    Log formatter that formats the timestamp once per second
+    
+    Records are formatted by the single queue listener thread, so the cache needs no lock.
+    """
+    
+    def __init__(self, fmt: str):
+        """
+        Initialize the formatter
+        
+        Args:
+            fmt: Log record format string
+        """
+        super().__init__(fmt)
+        self._cached_second = None
+        self._cached_time = ""
+    
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        """Format the record time like logging.Formatter, reusing the date and time of the previous record"""
+        if datefmt is not None:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_time = time.strftime(self.default_time_format, self.converter(second))
+        return self.default_msec_format % (self._cached_time, record.msecs)
+
 def setup_logging(log_file: str = "sketchdojo_server.log", level=logging.INFO):
     """
     Set up logging configuration
@@ -242,15 +310,26 @@ def setup_logging(log_file: str = "sketchdojo_server.log", level=logging.INFO):
     # Full path to log file
     log_path = os.path.join("logs", log_file)
     
-    # Configure logging
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
+    # Configure logging, like basicConfig this does nothing if the root logger already has handlers
+    root_logger = logging.getLogger()
+    if not root_logger.handlers:
+        # One formatter shared by both handlers
+        formatter = _CachedTimeFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        handlers = [
             logging.StreamHandler(),
             logging.FileHandler(log_path),
-        ],
-    )
+        ]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        # Handlers write from a background thread, logging calls only enqueue the record
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        
+        root_logger.setLevel(level)
+        root_logger.addHandler(QueueHandler(log_queue))
     
     # Reduce logging level for some verbose libraries
     logging.getLogger("urllib3").setLevel(logging.WARNING)
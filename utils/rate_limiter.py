@@ -0,0 +1,65 @@
+"""
+Client-side rate limiting for outbound API requests
+"""
+import asyncio
+import logging
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class AsyncTokenBucket:
+    """
+    Token bucket limiting both requests per minute and tokens per minute
+
+    Both buckets start full and refill continuously at their per-minute rate.
+    Waiters are served in arrival order, because the lock is held while the
+    first waiter sleeps for capacity.
+    """
+
+    def __init__(self, rate_rpm: float, rate_tpm: float):
+        """
+        Initialize the rate limiter
+
+        Args:
+            rate_rpm: Allowed requests per minute
+            rate_tpm: Allowed tokens per minute
+        """
+        self.rate_rpm = rate_rpm
+        self.rate_tpm = rate_tpm
+        self._requests = float(rate_rpm)
+        self._tokens = float(rate_tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Add the capacity accumulated since the last refill"""
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rate_rpm, self._requests + elapsed * self.rate_rpm / 60)
+        self._tokens = min(self.rate_tpm, self._tokens + elapsed * self.rate_tpm / 60)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait until one request and the given number of tokens are available
+
+        Args:
+            tokens: Estimated number of tokens used by the request
+        """
+        # A request larger than the whole bucket would otherwise wait forever
+        tokens = min(tokens, self.rate_tpm)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+
+                wait = max(
+                    (1 - self._requests) * 60 / self.rate_rpm,
+                    (tokens - self._tokens) * 60 / self.rate_tpm,
+                )
+                logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+                await asyncio.sleep(wait)
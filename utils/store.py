@@ -0,0 +1,142 @@
+"""
+Bounded in-memory stores for API state (tasks, projects, chat history)
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+_MISSING = object()
+
+class Store:
+    """
+    Key/value store with a size cap and least-recently-used eviction
+
+    Entries can optionally expire after ``ttl`` seconds. When the store is full,
+    entries matching the ``evict_first`` predicate (e.g. finished tasks) are
+    dropped before any other entry, oldest first.
+
+    Methods never await, so read-modify-write operations like ``append`` are
+    atomic with respect to other coroutines on the event loop. The store is not
+    meant to be shared with worker threads.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        max_items: Optional[int] = None,
+        evict_first: Optional[Callable[[Any], bool]] = None
+    ):
+        """
+        Initialize the store
+
+        Args:
+            maxsize: Maximum number of keys kept in the store
+            ttl: Optional time-to-live in seconds, refreshed on every write
+            max_items: Optional cap on list values grown through append (oldest items are dropped)
+            evict_first: Optional predicate marking values to evict before all others
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_items = max_items
+        self.evict_first = evict_first
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._expires: Dict[Hashable, float] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get the value for a key, marking it as recently used
+
+        Args:
+            key: Key to look up
+            default: Value returned when the key is missing or expired
+
+        Returns:
+            The stored value or the default
+        """
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        if self.ttl is not None and self._expires[key] <= time.monotonic():
+            self.delete(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting old entries if the store is full
+
+        Args:
+            key: Key to store the value under
+            value: Value to store
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + self.ttl
+        if len(self._data) > self.maxsize:
+            self._evict()
+
+    def append(self, key: Hashable, *items: Any) -> List[Any]:
+        """
+        Append items to the list stored under a key, creating it if needed
+
+        Args:
+            key: Key of the list
+            items: Items to append
+
+        Returns:
+            The updated list
+        """
+        values = self.get(key)
+        if values is None:
+            values = []
+        values.extend(items)
+        if self.max_items is not None and len(values) > self.max_items:
+            # Keep the most recent items, drop the oldest turns first
+            del values[:-self.max_items]
+        self.set(key, values)
+        return values
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Remove a key from the store if present
+
+        Args:
+            key: Key to remove
+        """
+        self._data.pop(key, None)
+        self._expires.pop(key, None)
+
+    def _evict(self) -> None:
+        """Drop entries until the store is back within its size cap"""
+        now = time.monotonic()
+        if self.ttl is not None:
+            for key in [k for k, expires in self._expires.items() if expires <= now]:
+                self.delete(key)
+
+        if self.evict_first is not None:
+            for key in [k for k, v in self._data.items() if self.evict_first(v)]:
+                if len(self._data) <= self.maxsize:
+                    return
+                self.delete(key)
+
+        while len(self._data) > self.maxsize:
+            key, _ = self._data.popitem(last=False)
+            self._expires.pop(key, None)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
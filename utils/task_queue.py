@@ -0,0 +1,69 @@
+"""
+In-process job queue for long-running generation tasks
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class TaskQueue:
+    """
+    Queue of coroutine jobs consumed by a fixed pool of worker tasks
+
+    Jobs are decoupled from the request that enqueued them, and the number of
+    generations running at the same time is bounded by the number of workers.
+    """
+
+    def __init__(self, num_workers: int = 2):
+        """
+        Initialize the task queue
+
+        Args:
+            num_workers: Number of jobs processed concurrently
+        """
+        self.num_workers = num_workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop"""
+        for worker_id in range(self.num_workers):
+            self._workers.append(asyncio.create_task(self._worker(worker_id)))
+        logger.info(f"TaskQueue started with {self.num_workers} workers")
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks and wait for them to exit"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        logger.info("TaskQueue stopped")
+
+    def enqueue(self, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> None:
+        """
+        Add a job to the queue
+
+        Args:
+            func: Coroutine function to run
+            args: Positional arguments for the job
+            kwargs: Keyword arguments for the job
+        """
+        self._queue.put_nowait((func, args, kwargs))
+
+    async def _worker(self, worker_id: int) -> None:
+        """
+        Process jobs from the queue until cancelled
+
+        Args:
+            worker_id: Index of the worker, used for logging
+        """
+        while True:
+            func, args, kwargs = await self._queue.get()
+            try:
+                await func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Job {func.__name__} failed in worker {worker_id}: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()